@@ -10,16 +10,40 @@ CSIV Interactive Demo Sandbox Game v7.2
 - Toggleable expensive SIB broadcasting (T).
 - State transitions with fade, probation, recovery.
 - ESC requires double-press to exit (single press toggles menu), early stray ESCs ignored.
-Requirements: Python 3.8+, pygame
+- Fixed-timestep simulation (SIM_HZ) decoupled from rendering; renderer interpolates UE motion.
+- Building-aware propagation: path loss plus obstruction loss from cached per-tower shadow maps.
+- Engine metrics (counters/histograms) exported in OpenMetrics text format to a file or local HTTP port.
+- Headless city-scale mode sharded across worker processes with shared-memory border halo exchange (--shards).
+- Scripted attack scenarios run in bulk with time-to-SUSPECT / time-to-BARRED reports (--scenario).
+- Deterministic record/replay of interactive sessions (--record / --replay [--headless]).
+- spVer scored against fixed-size per-tower measurement windows (robust median/MAD z-score).
+- Grid-accelerated Poisson-disk tower placement with bulk region generation.
+Requirements: Python 3.8+, pygame, numpy
 Run: python3 csiv_demo_v7_2.py
 """
 
 import pygame
+import numpy as np
 import math
 import time
 import random
 import statistics
 import sys
+import os
+import bisect
+import threading
+import http.server
+import argparse
+import hashlib
+import functools
+import json
+import gzip
+import zlib
+import struct
+import multiprocessing
+import queue
+import traceback
+from multiprocessing import shared_memory
 from collections import deque
 
 # ---------------- Configuration ----------------
@@ -60,6 +84,21 @@ ROGUE_PROBABILITY = 0.02
 MIN_TOWER_SPACING = 50
 BUILDINGS_PER_CHUNK = 3
 
+# Propagation / shadowing
+PATH_LOSS_EXPONENT = 1.0          # received level ~ 1 / d**n
+PROP_CELL_SIZE = 8                # occupancy raster resolution (world units); must divide CHUNK_SIZE
+PROP_RADIUS = 300.0               # half-extent of each tower's cached attenuation map
+BUILDING_LOSS_DB_PER_UNIT = 0.25  # obstruction loss per world unit of building crossed
+BUILDING_LOSS_MAX_DB = 25.0
+
+# spVer windowed statistics
+SPVER_WINDOW = 16           # samples kept per tower
+SPVER_MIN_SAMPLES = 4       # no spVer deviation until the window has this many samples
+SPVER_Z_BASE = 2.0
+SPVER_ALPHA_CV = 0.5        # threshold grows with the window's coefficient of variation
+SPVER_MIN_REL_SCALE = 0.1   # floor on the robust scale, as a fraction of the window median (noise is 0.05)
+SPVER_STALE_AFTER = 1.0     # seconds without a sample before a tower's window restarts
+
 # Chunk generation pacing
 PREFETCH_RADIUS = 1
 MAX_CHUNKS_PER_FRAME = 1
@@ -74,9 +113,25 @@ SIB_DRAW_DISTANCE = 300.0
 # Tower update throttling
 TOWER_UPDATE_INTERVAL = 0.25
 
+# Simulation / render timing
+SIM_HZ = 60.0                 # fixed simulation step rate
+MAX_SIM_STEPS_PER_FRAME = 8   # catch-up cap; backlog beyond this is dropped (sim slows down)
+RENDER_FPS = 60               # render cap; 0 = uncapped
+UE_SPEED = 180.0              # world units per second
+
+# Metrics export
+METRICS_FILE = None         # e.g. "csiv_metrics.txt"; rewritten every METRICS_INTERVAL seconds
+METRICS_INTERVAL = 10.0     # wall seconds between file writes
+METRICS_HTTP_PORT = None    # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
 # SIB generation toggle (user-controlled)
 generate_sib_traffic = False  # only generate when True
 
+# Runtime-tunable globals captured in session recordings
+TUNABLE_PARAMS = ("W_DVER", "W_PVER", "W_SPVER", "THETA_SUSPECT", "THETA_BARRED",
+                  "COMBO_PRIORITY_LOCATION_BOOST", "generate_sib_traffic")
+
 # Colors
 COLOR_ROAD = (60, 60, 60)
 COLOR_BUILDING = (80, 80, 100)
@@ -91,19 +146,286 @@ COLORS_STATE = {
 
 FONT_NAME = "consolas"
 
+class SimClock:
+    """Simulation time in seconds, advanced only by fixed sim steps."""
+    def __init__(self, start=0.0):
+        self.t = start
+
+    def advance(self, dt):
+        self.t += dt
+
+sim_clock = SimClock()
+
+# All simulation randomness goes through sim_rng so rendering never perturbs detection results.
+sim_rng = random.Random()
+
 def now():
-    return time.time()
+    return sim_clock.t
+
+# ---------------- Propagation ----------------
+
+class PropagationModel:
+    """Path loss plus building obstruction.
+
+    Each loaded chunk gets a boolean occupancy raster (PROP_CELL_SIZE cells, indexed [ix, iy]).
+    Each tower gets a cached attenuation map in dB covering PROP_RADIUS around it, built by
+    marching rays from the tower to every map cell through the occupancy rasters. Maps for
+    towers in a newly loaded chunk are built immediately. A map that overlaps a newly loaded
+    chunk is patched in place: unloaded chunks count as open ground, so the new chunk only adds
+    loss, and only the cells whose rays can cross its buildings are re-marched.
+    """
+    def __init__(self):
+        self.cells_per_chunk = CHUNK_SIZE // PROP_CELL_SIZE
+        self.half_cells = int(math.ceil(PROP_RADIUS / PROP_CELL_SIZE))
+        self.occupancy = {}
+        self.shadow_maps = {}
+        self.map_towers = {}
+
+    def add_chunk(self, chunk, rects, new_towers=()):
+        n = self.cells_per_chunk
+        grid = np.zeros((n, n), dtype=bool)
+        base_x = chunk[0] * CHUNK_SIZE
+        base_y = chunk[1] * CHUNK_SIZE
+        for rect in rects:
+            x0 = max(0, int((rect.x - base_x) // PROP_CELL_SIZE))
+            y0 = max(0, int((rect.y - base_y) // PROP_CELL_SIZE))
+            x1 = min(n, int(math.ceil((rect.right - base_x) / PROP_CELL_SIZE)))
+            y1 = min(n, int(math.ceil((rect.bottom - base_y) / PROP_CELL_SIZE)))
+            grid[x0:x1, y0:y1] = True
+        self.occupancy[chunk] = grid
+
+        ox, oy = np.nonzero(grid)
+        if len(ox):
+            # Global cell bounds of the new buildings; only maps overlapping them can change.
+            bx0 = chunk[0] * n + int(ox.min())
+            bx1 = chunk[0] * n + int(ox.max()) + 1
+            by0 = chunk[1] * n + int(oy.min())
+            by1 = chunk[1] * n + int(oy.max()) + 1
+            for tower in self.map_towers.values():
+                mx, my, m = self.shadow_maps[tower.id]
+                if mx < bx1 and bx0 < mx + m.shape[0] and my < by1 and by0 < my + m.shape[1]:
+                    self._patch_shadow_map(tower, chunk, grid, (bx0, by0, bx1, by1))
+        for t in new_towers:
+            self.build_shadow_map(t)
+
+    def _window_occupancy(self, gx0, gy0, size):
+        """Assemble the occupancy of global cells [gx0, gx0+size) x [gy0, gy0+size)."""
+        n = self.cells_per_chunk
+        window = np.zeros((size, size), dtype=bool)
+        for cx in range(gx0 // n, (gx0 + size - 1) // n + 1):
+            for cy in range(gy0 // n, (gy0 + size - 1) // n + 1):
+                grid = self.occupancy.get((cx, cy))
+                if grid is None:
+                    continue
+                ax0 = max(gx0, cx * n)
+                ay0 = max(gy0, cy * n)
+                ax1 = min(gx0 + size, (cx + 1) * n)
+                ay1 = min(gy0 + size, (cy + 1) * n)
+                window[ax0 - gx0:ax1 - gx0, ay0 - gy0:ay1 - gy0] = \
+                    grid[ax0 - cx * n:ax1 - cx * n, ay0 - cy * n:ay1 - cy * n]
+        return window
+
+    def _march(self, occ, tx, ty, ex, ey, first=0):
+        """Building loss (dB, unclipped) along rays from (tx, ty) with cell offsets (ex, ey) through occ.
+
+        Samples before index `first` are skipped; the caller knows they fall on open ground.
+        """
+        size = occ.shape[0]
+        samples = int(math.ceil(self.half_cells * math.sqrt(2))) + 1
+        f = (np.arange(first + 1, samples + 1, dtype=np.float32) / samples).reshape((-1,) + (1,) * ex.ndim)
+        ix = np.clip((tx + f * ex).astype(np.intp), 0, size - 1)
+        iy = np.clip((ty + f * ey).astype(np.intp), 0, size - 1)
+        # One flat gather is about twice as fast as fancy-indexing occ[ix, iy].
+        blocked = occ.ravel().take(ix * size + iy).sum(axis=0, dtype=np.int32)
+        seg_len = np.hypot(ex, ey) * PROP_CELL_SIZE
+        return blocked * (seg_len / samples) * BUILDING_LOSS_DB_PER_UNIT
+
+    def build_shadow_map(self, tower):
+        h = self.half_cells
+        size = 2 * h + 1
+        gx0 = int(math.floor(tower.pos[0] / PROP_CELL_SIZE)) - h
+        gy0 = int(math.floor(tower.pos[1] / PROP_CELL_SIZE)) - h
+        occ = self._window_occupancy(gx0, gy0, size)
+
+        # Ray march from the tower to each cell centre, in window cell coordinates.
+        tx = tower.pos[0] / PROP_CELL_SIZE - gx0
+        ty = tower.pos[1] / PROP_CELL_SIZE - gy0
+        centres = np.arange(size, dtype=np.float32) + 0.5
+        loss = self._march(occ, tx, ty, centres[:, None] - tx, centres[None, :] - ty)
+        self.shadow_maps[tower.id] = (gx0, gy0, np.minimum(loss, BUILDING_LOSS_MAX_DB).astype(np.float32))
+        self.map_towers[tower.id] = tower
+
+    def _patch_shadow_map(self, tower, chunk, grid, bbox):
+        """Add the loss of a newly loaded chunk's buildings to an existing map.
+
+        The chunk was open ground when the map was built, so its loss simply adds on (clipping
+        commutes with that: min(min(a, M) + d, M) == min(a + d, M)). Only cells whose direction
+        from the tower falls within the angular span of the buildings' bounding box, and that lie
+        at least as far away as the box, are marched.
+        """
+        gx0, gy0, loss_map = self.shadow_maps[tower.id]
+        size = loss_map.shape[0]
+        tx = tower.pos[0] / PROP_CELL_SIZE - gx0
+        ty = tower.pos[1] / PROP_CELL_SIZE - gy0
+        bx0, by0, bx1, by1 = (bbox[0] - gx0, bbox[1] - gy0, bbox[2] - gx0, bbox[3] - gy0)
+        if bx0 <= tx < bx1 and by0 <= ty < by1:
+            self.build_shadow_map(tower)
+            return
+
+        # Angles relative to the direction of the box centre; the box subtends less than pi.
+        ref = math.atan2((by0 + by1) / 2 - ty, (bx0 + bx1) / 2 - tx)
+        corners = [math.atan2(cy - ty, cx - tx) - ref for cx in (bx0, bx1) for cy in (by0, by1)]
+        corners = [(a + math.pi) % (2 * math.pi) - math.pi for a in corners]
+        centres = np.arange(size, dtype=np.float32) + 0.5
+        ex = np.broadcast_to(centres[:, None] - tx, (size, size))
+        ey = np.broadcast_to(centres[None, :] - ty, (size, size))
+        rel = (np.arctan2(ey, ex) - ref + math.pi) % (2 * math.pi) - math.pi
+        near = math.hypot(max(bx0 - tx, 0, tx - bx1), max(by0 - ty, 0, ty - by1))
+        cells = ((rel >= min(corners) - 1e-6) & (rel <= max(corners) + 1e-6)
+                 & (np.hypot(ex, ey) >= near - 1e-3))
+
+        n = self.cells_per_chunk
+        occ = np.zeros((size, size), dtype=bool)
+        ax0 = max(0, chunk[0] * n - gx0)
+        ay0 = max(0, chunk[1] * n - gy0)
+        ax1 = min(size, (chunk[0] + 1) * n - gx0)
+        ay1 = min(size, (chunk[1] + 1) * n - gy0)
+        occ[ax0:ax1, ay0:ay1] = grid[ax0 + gx0 - chunk[0] * n:ax1 + gx0 - chunk[0] * n,
+                                     ay0 + gy0 - chunk[1] * n:ay1 + gy0 - chunk[1] * n]
+        ex = ex[cells]
+        ey = ey[cells]
+        if not len(ex):
+            return
+        # Samples at fraction f of a ray are f * length from the tower: none before near reach the box.
+        samples = int(math.ceil(self.half_cells * math.sqrt(2))) + 1
+        first = max(0, int(near / float(np.hypot(ex, ey).max()) * samples) - 1)
+        added = self._march(occ, tx, ty, ex, ey, first)
+        loss_map[cells] = np.minimum(loss_map[cells] + added, BUILDING_LOSS_MAX_DB)
+
+    def attenuation_db(self, tower, positions):
+        """Obstruction loss (dB) from tower to each row of positions, shape (N, 2)."""
+        entry = self.shadow_maps.get(tower.id)
+        if entry is None:
+            self.build_shadow_map(tower)
+            entry = self.shadow_maps[tower.id]
+        gx0, gy0, loss_map = entry
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        ix = np.floor(positions[:, 0] / PROP_CELL_SIZE).astype(np.intp) - gx0
+        iy = np.floor(positions[:, 1] / PROP_CELL_SIZE).astype(np.intp) - gy0
+        size = loss_map.shape[0]
+        inside = (ix >= 0) & (ix < size) & (iy >= 0) & (iy < size)
+        out = np.zeros(len(positions), dtype=np.float64)
+        out[inside] = loss_map[ix[inside], iy[inside]]
+        return out
+
+# ---------------- spVer statistics ----------------
+
+class SpVerStats:
+    """Fixed-size per-tower measurement windows for spVer, stored as one 2-D array.
+
+    Each tower owns a row (slot) of SPVER_WINDOW samples used as a ring buffer. Windowed
+    sum / sum of squares are updated in O(1) per sample (re-summed from the row each time
+    the ring wraps, to shed rounding drift); median / MAD are taken over the fixed-size row,
+    so every update costs the same regardless of how long a tower has been measured. push()
+    updates many towers in one vectorized call.
+    """
+    def __init__(self, window=None, capacity=64):
+        self.window = window if window is not None else SPVER_WINDOW
+        self.size = 0
+        self.buf = np.full((capacity, self.window), np.nan)
+        self.head = np.zeros(capacity, dtype=np.intp)
+        self.count = np.zeros(capacity, dtype=np.intp)
+        self.sum = np.zeros(capacity)
+        self.sumsq = np.zeros(capacity)
+        self.last_time = np.full(capacity, -np.inf)
+
+    def allocate(self):
+        """Reserve a row for a new tower; returns its slot."""
+        if self.size == len(self.head):
+            grow = len(self.head)
+            self.buf = np.vstack([self.buf, np.full((grow, self.window), np.nan)])
+            self.head = np.concatenate([self.head, np.zeros(grow, dtype=np.intp)])
+            self.count = np.concatenate([self.count, np.zeros(grow, dtype=np.intp)])
+            self.sum = np.concatenate([self.sum, np.zeros(grow)])
+            self.sumsq = np.concatenate([self.sumsq, np.zeros(grow)])
+            self.last_time = np.concatenate([self.last_time, np.full(grow, -np.inf)])
+        self.size += 1
+        return self.size - 1
+
+    def mean_std(self, slots):
+        n = np.maximum(self.count[slots], 1)
+        mean = self.sum[slots] / n
+        var = np.maximum(self.sumsq[slots] / n - mean * mean, 0.0)
+        return mean, np.sqrt(var)
+
+    def push(self, slots, values, current):
+        """Score each value against its tower's window, then append it; returns deviations in [0, 1].
+
+        slots must not repeat within one call. A window that has gone SPVER_STALE_AFTER seconds
+        without samples (e.g. the tower left the vicinity) starts over instead of comparing
+        against old conditions.
+        """
+        slots = np.asarray(slots, dtype=np.intp)
+        x = np.asarray(values, dtype=np.float64)
+        dev = np.zeros(len(slots))
+
+        stale = slots[current - self.last_time[slots] > SPVER_STALE_AFTER]
+        if len(stale):
+            self.buf[stale] = np.nan
+            self.head[stale] = 0
+            self.count[stale] = 0
+            self.sum[stale] = 0.0
+            self.sumsq[stale] = 0.0
+        self.last_time[slots] = current
+
+        # Score against the window before inserting, so an outlier can't mask itself.
+        ready = self.count[slots] >= SPVER_MIN_SAMPLES
+        if ready.any():
+            rs = slots[ready]
+            rows = self.buf[rs]
+            full = self.count[rs] == self.window
+            median = np.empty(len(rs))
+            mad = np.empty(len(rs))
+            if full.any():
+                median[full] = np.median(rows[full], axis=1)
+                mad[full] = np.median(np.abs(rows[full] - median[full, None]), axis=1)
+            if (~full).any():
+                median[~full] = np.nanmedian(rows[~full], axis=1)
+                mad[~full] = np.nanmedian(np.abs(rows[~full] - median[~full, None]), axis=1)
+            mean, std = self.mean_std(rs)
+            scale = np.maximum(1.4826 * mad, SPVER_MIN_REL_SCALE * np.abs(median))
+            z = np.abs(x[ready] - median) / scale
+            cv = std / np.maximum(mean, 1e-6)
+            z_threshold = SPVER_Z_BASE * (1 + SPVER_ALPHA_CV * cv)
+            dev[ready] = np.where(z > z_threshold, np.minimum(1.0, (z - z_threshold) / z_threshold), 0.0)
+
+        # O(1) ring-buffer insert.
+        head = self.head[slots]
+        old = self.buf[slots, head]
+        evict = self.count[slots] == self.window
+        self.sum[slots] += x - np.where(evict, old, 0.0)
+        self.sumsq[slots] += x * x - np.where(evict, old * old, 0.0)
+        self.buf[slots, head] = x
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.window)
+        head = (head + 1) % self.window
+        self.head[slots] = head
+        wrapped = slots[head == 0]
+        if len(wrapped):
+            self.sum[wrapped] = self.buf[wrapped].sum(axis=1)
+            self.sumsq[wrapped] = (self.buf[wrapped] ** 2).sum(axis=1)
+        return dev
 
 # ---------------- Entities ----------------
 
 class Tower:
-    def __init__(self, tid, pos, priority=3, neighbors=None, identity=None, is_rogue=False):
+    def __init__(self, tid, pos, priority=3, neighbors=None, identity=None, is_rogue=False, propagation=None,
+                 spver_stats=None):
         self.id = tid
         self.pos = pos
         self.priority = priority
         self.neighbors = neighbors if neighbors is not None else []
         self.identity = identity if identity is not None else f"ID_{tid}"
-        self.TAC = f"0x{random.randint(0, 0xFFFF):04X}"
+        self.TAC = f"0x{sim_rng.randint(0, 0xFFFF):04X}"
         self.S = 0.0
         self.last_update = now()
         self.state = "CLEAN"
@@ -116,23 +438,45 @@ class Tower:
         self.clean_streak = 0
         self.out_of_range_since = None
         self.cooldown_until = 0.0
-        self.mu = None
-        self.v = None
-        self.next_sib_time = now() + random.uniform(1.0, 3.0)
+        self.spver_stats = spver_stats
+        self.spver_slot = spver_stats.allocate() if spver_stats is not None else None
+        self.next_sib_time = now() + sim_rng.uniform(1.0, 3.0)
         self.next_state_update = now()
         self.is_rogue = is_rogue
+        self.propagation = propagation
+        self.noise_rng = None  # measurement noise source; None draws from sim_rng
+        self.suppress_neighbors = False  # advertises no neighbors but still appears in others' lists
+        self.tx_gain = 1.0
         if self.is_rogue and not self.identity.endswith("_ROGUE"):
             self.identity += "_ROGUE"
 
     def distance_to(self, point):
         return math.hypot(self.pos[0] - point[0], self.pos[1] - point[1])
 
+    def modelled_level(self, positions):
+        """Received level at nominal transmit power: path loss plus modelled building obstruction."""
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        d = np.maximum(0.1, np.hypot(positions[:, 0] - self.pos[0], positions[:, 1] - self.pos[1]))
+        level = 1.0 / d ** PATH_LOSS_EXPONENT
+        if self.propagation is not None:
+            level *= 10.0 ** (-self.propagation.attenuation_db(self, positions) / 10.0)
+        return level
+
+    def expected_signal(self, positions):
+        """Noise-free received level at each row of positions, shape (N, 2)."""
+        return self.tx_gain * self.modelled_level(positions)
+
     def measure_signal(self, ue_pos):
-        d = max(0.1, self.distance_to(ue_pos))
-        base = 1.0 / d
-        noise = random.gauss(0, 0.05 * base)
+        base = float(self.expected_signal(ue_pos)[0])
+        noise = (self.noise_rng or sim_rng).gauss(0, 0.05 * base)
         return max(0.0, base + noise)
 
+    def spver_sample(self, ue_pos):
+        """Measured level relative to the modelled level at the UE's position. Path loss and building
+        shadowing change as the UE moves; dividing them out leaves transmit power and noise, so one
+        window stays comparable along a drive."""
+        return self.measure_signal(ue_pos) / float(self.modelled_level(ue_pos)[0])
+
     def compute_pVer_deviation(self, towers):
         neighbor_prios = []
         for nid in self.neighbors:
@@ -148,30 +492,21 @@ class Tower:
         high_priority_flag = (crp - median_prio) >= 1
         return d_p, high_priority_flag
 
-    def compute_dVer_duplicate_identity(self, towers):
-        dup = any((t.identity == self.identity) for t in towers.values() if t is not self)
+    def compute_dVer_duplicate_identity(self, towers, identity_counts=None):
+        # identity_counts (identity -> number of towers) turns the scan into a lookup.
+        if identity_counts is not None:
+            dup = identity_counts.get(self.identity, 0) > 1
+        else:
+            dup = any((t.identity == self.identity) for t in towers.values() if t is not self)
         return (1.0 if dup else 0.0), dup
 
     def compute_spVer_deviation(self, ue_pos):
-        x_t = self.measure_signal(ue_pos)
-        beta = 0.2
-        if self.mu is None:
-            self.mu = x_t
-            self.v = 0.0
-        else:
-            self.mu = (1 - beta) * self.mu + beta * x_t
-            self.v = (1 - beta) * self.v + beta * ((x_t - self.mu) ** 2)
-        sigma = math.sqrt(max(self.v, 1e-6))
-        z = abs(x_t - self.mu) / sigma if sigma > 0 else 0.0
-        cv = sigma / max(self.mu, 1e-6)
-        z_base = 2.0
-        alpha_cv = 0.5
-        z_threshold = z_base * (1 + alpha_cv * cv)
-        if z > z_threshold:
-            dev = min(1.0, (z - z_threshold) / z_threshold)
-        else:
-            dev = 0.0
-        return dev
+        if self.spver_stats is None:
+            # Stand-alone tower: lazily give it a private one-row window.
+            self.spver_stats = SpVerStats(capacity=1)
+            self.spver_slot = self.spver_stats.allocate()
+        x_t = self.spver_sample(ue_pos)
+        return float(self.spver_stats.push([self.spver_slot], [x_t], now())[0])
 
     def set_state(self, new_state, current):
         if new_state != self.state:
@@ -181,7 +516,7 @@ class Tower:
             if new_state == "BARRED":
                 self.barred_start_time = current
 
-    def update_state(self, ue_pos, towers):
+    def update_state(self, ue_pos, towers, identity_counts=None, d_spVer=None):
         global W_DVER, W_PVER, W_SPVER, THETA_SUSPECT, THETA_BARRED
         current = now()
         dist = self.distance_to(ue_pos)
@@ -201,8 +536,9 @@ class Tower:
         self.last_update = current
 
         d_pVer, high_priority_flag = self.compute_pVer_deviation(towers)
-        d_dVer, dup_flag = self.compute_dVer_duplicate_identity(towers)
-        d_spVer = self.compute_spVer_deviation(ue_pos)
+        d_dVer, dup_flag = self.compute_dVer_duplicate_identity(towers, identity_counts)
+        if d_spVer is None:
+            d_spVer = self.compute_spVer_deviation(ue_pos)
 
         delta_S = W_DVER * d_dVer + W_PVER * d_pVer + W_SPVER * d_spVer
         if high_priority_flag and dup_flag:
@@ -286,18 +622,20 @@ class Tower:
             return blended
         return COLORS_STATE.get(self.state, (255, 255, 255))
 
-    def generate_sib_info(self):
+    def generate_sib_info(self, rng=None):
+        # Display-only callers pass their own rng so they don't consume sim_rng draws.
+        rng = rng if rng is not None else sim_rng
         if self.state == "BARRED":
             access_barring = {"barringFactor": "high", "accessCategory": "default"}
         else:
-            access_barring = {"barringFactor": random.choice(["low", "medium"]), "accessCategory": "default"}
+            access_barring = {"barringFactor": rng.choice(["low", "medium"]), "accessCategory": "default"}
 
         random_access = {
-            "preambleInitialReceivedTargetPower": -100 + random.randint(0, 5),
+            "preambleInitialReceivedTargetPower": -100 + rng.randint(0, 5),
             "powerRampingStep": 2,
         }
-        si_periodicity = random.choice(["rf8", "rf16", "rf32"])
-        si_window_length = random.choice(["ms1", "ms2"])
+        si_periodicity = rng.choice(["rf8", "rf16", "rf32"])
+        si_window_length = rng.choice(["ms1", "ms2"])
 
         sib = {
             "plmn_list": ["00101"],
@@ -317,65 +655,248 @@ class Tower:
 class UE:
     def __init__(self, pos):
         self.pos = list(pos)
+        self.prev_pos = list(pos)
+
+    def move(self, direction, dt):
+        self.prev_pos = list(self.pos)
+        speed = UE_SPEED * dt
+        self.pos[0] += direction[0] * speed
+        self.pos[1] += direction[1] * speed
+
+    def lerp_pos(self, alpha):
+        """Position blended between the last two sim steps, for rendering."""
+        return (self.prev_pos[0] + (self.pos[0] - self.prev_pos[0]) * alpha,
+                self.prev_pos[1] + (self.pos[1] - self.prev_pos[1]) * alpha)
 
 # ---------------- Utilities & Rendering ----------------
 
 def chunk_coords(pos):
     return (int(math.floor(pos[0] / CHUNK_SIZE)), int(math.floor(pos[1] / CHUNK_SIZE)))
 
-def generate_non_overlapping_position(existing_positions, base_x, base_y, size, min_spacing, max_tries=100):
+class PlacementGrid:
+    """Poisson-disk spacing index: positions hashed into square cells of side min_spacing / sqrt(2).
+
+    Any point closer than min_spacing to a candidate lies within two cells of it, so a check
+    touches at most 5x5 cells however many towers exist.
+    """
+    def __init__(self, min_spacing, positions=()):
+        self.min_spacing = min_spacing
+        self.cell = min_spacing / math.sqrt(2)
+        self.cells = {}
+        for pos in positions:
+            self.add(pos)
+
+    def _key(self, x, y):
+        return int(math.floor(x / self.cell)), int(math.floor(y / self.cell))
+
+    def fits(self, x, y):
+        i, j = self._key(x, y)
+        r2 = self.min_spacing * self.min_spacing
+        for di in range(-2, 3):
+            for dj in range(-2, 3):
+                for ex, ey in self.cells.get((i + di, j + dj), ()):
+                    if (x - ex) * (x - ex) + (y - ey) * (y - ey) < r2:
+                        return False
+        return True
+
+    def add(self, pos):
+        self.cells.setdefault(self._key(pos[0], pos[1]), []).append((pos[0], pos[1]))
+
+def generate_non_overlapping_position(placement, base_x, base_y, size, max_tries=100):
+    """Dart-throw a position in the chunk at least placement.min_spacing from every placed tower and record it.
+
+    If no dart fits, a position anywhere inside the chunk is used so the chunk still gets its tower.
+    """
     for _ in range(max_tries):
-        x = random.uniform(base_x + 20, base_x + size - 20)
-        y = random.uniform(base_y + 20, base_y + size - 20)
-        if all(math.hypot(x - ex, y - ey) >= min_spacing for (ex, ey) in existing_positions):
-            return x, y
-    return random.uniform(base_x + 20, base_x + size - 20), random.uniform(base_y + 20, base_y - 20)
-
-def generate_towers_buildings(chunk_x, chunk_y, towers, buildings, next_id):
-    existing_positions = [t.pos for t in towers.values()]
+        x = sim_rng.uniform(base_x + 20, base_x + size - 20)
+        y = sim_rng.uniform(base_y + 20, base_y + size - 20)
+        if placement.fits(x, y):
+            break
+    else:
+        x = sim_rng.uniform(base_x + 20, base_x + size - 20)
+        y = sim_rng.uniform(base_y + 20, base_y + size - 20)
+    placement.add((x, y))
+    return x, y
+
+# Cells that can hold a point closer than min_spacing: the 5x5 block minus its corners, which
+# are at least min_spacing away from anything in the centre cell.
+POISSON_OFFSETS = np.array([(di, dj) for di in range(-2, 3) for dj in range(-2, 3) if abs(di) + abs(dj) < 4])
+
+def sample_poisson_disk(chunks, counts, placement, rng, max_tries=30):
+    """Poisson-disk tower positions for many chunks at once; returns one list of (x, y) per chunk.
+
+    The grid holds one point index per cell. Chunks are worked in four parity classes: chunks of
+    the same class are a whole chunk apart, so every chunk of a class throws one dart per round
+    and the round is tested against the grid in a single array operation. A chunk whose darts miss
+    max_tries times in a row is full and keeps the towers placed so far. Points already in
+    `placement` are respected and the new ones are added to it.
+    """
+    cell = placement.cell
+    r2 = placement.min_spacing * placement.min_spacing
+    cxy = np.array(chunks, dtype=np.int64).reshape(-1, 2)
+    counts = np.asarray(counts, dtype=np.int64)
+    lo = np.floor(cxy.min(axis=0) * CHUNK_SIZE / cell).astype(np.int64) - 3
+    hi = np.floor((cxy.max(axis=0) + 1) * CHUNK_SIZE / cell).astype(np.int64) + 3
+    grid = np.full(tuple(hi - lo + 1), -1, dtype=np.int64)
+    existing = [p for bucket in placement.cells.values() for p in bucket]
+    pts = np.zeros((len(existing) + int(counts.sum()), 2))
+    n = 0
+    for x, y in existing:
+        gx = int(math.floor(x / cell)) - lo[0]
+        gy = int(math.floor(y / cell)) - lo[1]
+        if 0 <= gx < grid.shape[0] and 0 <= gy < grid.shape[1] and grid[gx, gy] < 0:
+            grid[gx, gy] = n
+            pts[n] = (x, y)
+            n += 1
+
+    placed = [[] for _ in range(len(cxy))]
+    need = counts.copy()
+    misses = np.zeros(len(cxy), dtype=np.int64)
+    base = (cxy * CHUNK_SIZE).astype(float) + 20
+    parity = (cxy[:, 0] & 1) * 2 + (cxy[:, 1] & 1)
+    for cls in range(4):
+        active = np.flatnonzero((parity == cls) & (need > 0))
+        while active.size:
+            cand = base[active] + rng.random((active.size, 2)) * (CHUNK_SIZE - 40)
+            g = np.floor(cand / cell).astype(np.int64) - lo
+            nb = grid[g[:, None, 0] + POISSON_OFFSETS[:, 0], g[:, None, 1] + POISSON_OFFSETS[:, 1]]
+            d = pts[nb] - cand[:, None, :]
+            ok = ~((nb >= 0) & ((d * d).sum(axis=2) < r2)).any(axis=1)
+
+            hit = active[ok]
+            new = n + np.arange(hit.size)
+            pts[new] = cand[ok]
+            grid[g[ok, 0], g[ok, 1]] = new
+            n += hit.size
+            for c, (x, y) in zip(hit.tolist(), cand[ok].tolist()):
+                placed[c].append((x, y))
+                placement.add((x, y))
+            need[hit] -= 1
+            misses[hit] = 0
+            misses[active[~ok]] += 1
+            active = active[(need[active] > 0) & (misses[active] < max_tries)]
+    return placed
+
+def assign_neighbors(towers):
+    """Clean towers only see clean neighbors; rogue towers and towers with suppress_neighbors advertise none.
+
+    Candidates are bucketed by chunk, and each bucket is ranked against the chunks within
+    NEIGHBOR_RADIUS as one distance matrix.
+    """
+    clean = []
+    for t in towers.values():
+        if t.is_rogue:
+            t.neighbors = []
+        else:
+            clean.append(t)
+    if not clean:
+        return
+    pos = np.array([t.pos for t in clean], dtype=float)
+    ids = np.array([t.id for t in clean])
+    buckets = {}
+    for i, t in enumerate(clean):
+        buckets.setdefault(chunk_coords(t.pos), []).append(i)
+    ring = int(math.ceil(NEIGHBOR_RADIUS / CHUNK_SIZE))
+    for (cx, cy), members in buckets.items():
+        cand = np.array([i for dx in range(-ring, ring + 1) for dy in range(-ring, ring + 1)
+                         for i in buckets.get((cx + dx, cy + dy), ())])
+        members = np.array(members)
+        d = np.hypot(pos[members, None, 0] - pos[cand, 0], pos[members, None, 1] - pos[cand, 1])
+        d[(members[:, None] == cand) | (d > NEIGHBOR_RADIUS)] = np.inf
+        cand_ids = np.broadcast_to(ids[cand], d.shape)
+        order = np.lexsort((cand_ids, d), axis=1)[:, :MAX_NEIGHBORS]
+        near = np.take_along_axis(d, order, axis=1) < np.inf
+        near_ids = np.take_along_axis(cand_ids, order, axis=1)
+        for i, row_ids, row_near in zip(members.tolist(), near_ids.tolist(), near.tolist()):
+            t = clean[i]
+            t.neighbors = [] if t.suppress_neighbors else [tid for tid, ok in zip(row_ids, row_near) if ok]
+
+def generate_buildings(chunk_x, chunk_y):
+    base_x = chunk_x * CHUNK_SIZE
+    base_y = chunk_y * CHUNK_SIZE
+    bld_list = []
+    for _ in range(BUILDINGS_PER_CHUNK):
+        w = sim_rng.randint(40, 80)
+        h = sim_rng.randint(40, 80)
+        x = sim_rng.uniform(base_x + 10, base_x + CHUNK_SIZE - w - 10)
+        y = sim_rng.uniform(base_y + 10, base_y + CHUNK_SIZE - h - 10)
+        rect = pygame.Rect(int(x), int(y), int(w), int(h))
+        bld_list.append(rect)
+    return bld_list
+
+def generate_towers_buildings(chunk_x, chunk_y, towers, buildings, next_id, propagation=None,
+                              spver_stats=None, placement=None):
+    if placement is None:
+        placement = PlacementGrid(MIN_TOWER_SPACING, (t.pos for t in towers.values()))
     base_x = chunk_x * CHUNK_SIZE
     base_y = chunk_y * CHUNK_SIZE
     rogue_created = False
-    count = random.randint(TOWERS_PER_CHUNK_MIN, TOWERS_PER_CHUNK_MAX)
+    first_id = next_id
+    count = sim_rng.randint(TOWERS_PER_CHUNK_MIN, TOWERS_PER_CHUNK_MAX)
     for _ in range(count):
-        is_rogue = random.random() < ROGUE_PROBABILITY and len(towers) > 0 and not rogue_created
+        is_rogue = sim_rng.random() < ROGUE_PROBABILITY and len(towers) > 0 and not rogue_created
         if is_rogue:
-            existing = random.choice(list(towers.values()))
+            existing = sim_rng.choice(list(towers.values()))
             identity = existing.identity.replace("_ROGUE", "")
             priority = 7
             rogue_created = True
-            pos = generate_non_overlapping_position(existing_positions, base_x, base_y, CHUNK_SIZE, MIN_TOWER_SPACING)
-            t = Tower(next_id, pos, priority=priority, neighbors=[], identity=identity, is_rogue=True)
+            pos = generate_non_overlapping_position(placement, base_x, base_y, CHUNK_SIZE)
+            t = Tower(next_id, pos, priority=priority, neighbors=[], identity=identity, is_rogue=True,
+                      propagation=propagation, spver_stats=spver_stats)
         else:
             identity = None
-            priority = random.randint(2, 5)
-            pos = generate_non_overlapping_position(existing_positions, base_x, base_y, CHUNK_SIZE, MIN_TOWER_SPACING)
-            t = Tower(next_id, pos, priority=priority, neighbors=[], identity=identity, is_rogue=False)
-        existing_positions.append(t.pos)
+            priority = sim_rng.randint(2, 5)
+            pos = generate_non_overlapping_position(placement, base_x, base_y, CHUNK_SIZE)
+            t = Tower(next_id, pos, priority=priority, neighbors=[], identity=identity, is_rogue=False,
+                      propagation=propagation, spver_stats=spver_stats)
         towers[next_id] = t
         next_id += 1
 
-    all_towers = list(towers.values())
-    for t in all_towers:
-        if t.is_rogue:
-            t.neighbors = []
-        else:
-            candidates = [other for other in all_towers if other is not t and not other.is_rogue]
-            dists = sorted([(t.distance_to(other.pos), other.id) for other in candidates])
-            t.neighbors = [tid for dist, tid in dists if dist <= NEIGHBOR_RADIUS][:MAX_NEIGHBORS]
+    assign_neighbors(towers)
 
-    bld_list = []
-    for _ in range(BUILDINGS_PER_CHUNK):
-        w = random.randint(40, 80)
-        h = random.randint(40, 80)
-        x = random.uniform(base_x + 10, base_x + CHUNK_SIZE - w - 10)
-        y = random.uniform(base_y + 10, base_y + CHUNK_SIZE - h - 10)
-        rect = pygame.Rect(int(x), int(y), int(w), int(h))
-        bld_list.append(rect)
+    bld_list = generate_buildings(chunk_x, chunk_y)
     buildings[(chunk_x, chunk_y)] = bld_list
+    if propagation is not None:
+        propagation.add_chunk((chunk_x, chunk_y), bld_list, [towers[tid] for tid in range(first_id, next_id)])
 
     return next_id
 
+def generate_region(chunks, towers, buildings, next_id, propagation=None, spver_stats=None, placement=None,
+                    towers_per_chunk=None):
+    """Bulk-generate many chunks: positions from one vectorized Poisson-disk pass, neighbors linked
+    once at the end, and shadow maps left to be built lazily on first lookup. Returns the next free tower id."""
+    chunks = list(chunks)
+    if not chunks:
+        return next_id
+    if placement is None:
+        placement = PlacementGrid(MIN_TOWER_SPACING, (t.pos for t in towers.values()))
+    count_min, count_max = towers_per_chunk or (TOWERS_PER_CHUNK_MIN, TOWERS_PER_CHUNK_MAX)
+    counts = [sim_rng.randint(count_min, count_max) for _ in chunks]
+    rng = np.random.default_rng(sim_rng.getrandbits(64))
+    positions = sample_poisson_disk(chunks, counts, placement, rng)
+
+    pool = list(towers.values())
+    for (cx, cy), chunk_positions in zip(chunks, positions):
+        rogue_created = False
+        for pos in chunk_positions:
+            if sim_rng.random() < ROGUE_PROBABILITY and pool and not rogue_created:
+                identity = sim_rng.choice(pool).identity.replace("_ROGUE", "")
+                rogue_created = True
+                t = Tower(next_id, pos, priority=7, neighbors=[], identity=identity, is_rogue=True,
+                          propagation=propagation, spver_stats=spver_stats)
+            else:
+                t = Tower(next_id, pos, priority=sim_rng.randint(2, 5), neighbors=[], identity=None,
+                          is_rogue=False, propagation=propagation, spver_stats=spver_stats)
+            towers[next_id] = t
+            pool.append(t)
+            next_id += 1
+        bld_list = generate_buildings(cx, cy)
+        buildings[(cx, cy)] = bld_list
+        if propagation is not None:
+            propagation.add_chunk((cx, cy), bld_list)
+    assign_neighbors(towers)
+    return next_id
+
 def draw_city_block_background(surface, camera_offset, screen_size):
     width, height = screen_size
     start_chunk_x = int(math.floor(camera_offset[0] / CHUNK_SIZE)) - 1
@@ -531,10 +1052,972 @@ def draw_help_overlay(surface, font, screen_size):
         txt = small.render(line, True, (200, 200, 200))
         surface.blit(txt, (x + 16, y + 50 + i * 20))
 
+# ---------------- Metrics ----------------
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def _format_value(v):
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, labels=()):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# TYPE {self.name} counter", f"# HELP {self.name} {self.help_text}"]
+        values = list(self.values.items()) or ([((), 0)] if not self.labelnames else [])
+        for labels, v in values:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        return [f"# TYPE {self.name} gauge", f"# HELP {self.name} {self.help_text}",
+                f"{self.name} {_format_value(self.value)}"]
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self):
+        lines = [f"# TYPE {self.name} histogram", f"# HELP {self.name} {self.help_text}"]
+        counts = list(self.counts)
+        cumulative = 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            lines.append(f'{self.name}_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Minimal in-process metric store rendered in OpenMetrics text format."""
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text):
+        return self._register(Gauge(name, help_text))
+
+    def histogram(self, name, help_text, buckets):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def _register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def merge(self, other):
+        """Add another registry's samples into this one (e.g. per-shard registries)."""
+        for mine, theirs in zip(self.metrics, other.metrics):
+            if isinstance(mine, Counter):
+                for labels, v in theirs.values.items():
+                    mine.inc(v, labels)
+            elif isinstance(mine, Gauge):
+                mine.set(mine.value + theirs.value)
+            else:
+                mine.counts = [a + b for a, b in zip(mine.counts, theirs.counts)]
+                mine.sum += theirs.sum
+                mine.count += theirs.count
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_file(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve the registry at http://host:port/metrics from a daemon thread; returns the server."""
+        registry = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+class CSIVMetrics:
+    """The engine's counters and histograms, registered on one MetricsRegistry."""
+    def __init__(self, registry=None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        r = self.registry
+        self.evaluations = r.counter("csiv_evaluations", "CSIV evaluations of towers within the vicinity radius")
+        self.evaluation_rate = r.gauge("csiv_evaluations_per_second", "CSIV evaluations during the last simulated second")
+        self.transitions = r.counter("csiv_state_transitions", "Tower state transitions", ("from", "to"))
+        self.bar_events = r.counter("csiv_bar_events", "Transitions into BARRED")
+        self.backoff_level = r.histogram("csiv_bar_backoff_level", "recent_bar_count at each bar event",
+                                         (1, 2, 3, 4, 5, 6))
+        self.chunks_generated = r.counter("csiv_chunks_generated", "Chunks generated")
+        self.chunks_evicted = r.counter("csiv_chunks_evicted", "Chunks evicted")
+        self.towers_alive = r.gauge("csiv_towers_alive", "Towers currently in the world")
+        self.sib_emitted = r.counter("csiv_sib_messages_emitted", "SIB messages generated")
+        self.sib_dropped = r.counter("csiv_sib_messages_dropped", "SIB messages dropped at MAX_ACTIVE_SIB_MSGS")
+        self.tick_latency = r.histogram("csiv_tick_latency_seconds", "Wall-clock time of one simulation step",
+                                        (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+        self._window_start = None
+        self._window_evals = 0
+
+    def record_evaluations(self, count, current):
+        self.evaluations.inc(count)
+        if self._window_start is None:
+            self._window_start = current
+        self._window_evals += count
+        if current - self._window_start >= 1.0:
+            self.evaluation_rate.set(self._window_evals / (current - self._window_start))
+            self._window_start = current
+            self._window_evals = 0
+
+class MetricsExporter:
+    """Writes the registry to METRICS_FILE every METRICS_INTERVAL wall seconds and/or serves it over HTTP."""
+    def __init__(self, registry, path=None, interval=10.0, port=None):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.next_write = time.time() + interval
+        self.server = registry.serve(port) if port else None
+
+    def poll(self):
+        if self.path and time.time() >= self.next_write:
+            self.registry.write_file(self.path)
+            self.next_write = time.time() + self.interval
+
+    def close(self):
+        if self.path:
+            self.registry.write_file(self.path)
+        if self.server is not None:
+            self.server.shutdown()
+
+# ---------------- Simulation ----------------
+
+def count_identities(towers):
+    counts = {}
+    for t in towers.values():
+        counts[t.identity] = counts.get(t.identity, 0) + 1
+    return counts
+
+def batch_spver_deviations(towers, ue_positions):
+    """Measure and score spVer for every in-vicinity tower at once, one push() per stats store.
+
+    Returns tower id -> deviation; towers without a shared store are left to update_state.
+    """
+    groups = {}
+    for t, pos in zip(towers, ue_positions):
+        if t.spver_stats is not None and t.distance_to(pos) <= CSIV_VICINITY_RADIUS:
+            groups.setdefault(id(t.spver_stats), []).append((t, pos))
+    deviations = {}
+    for items in groups.values():
+        store = items[0][0].spver_stats
+        values = [t.spver_sample(pos) for t, pos in items]
+        devs = store.push([t.spver_slot for t, _ in items], values, now())
+        for (t, _), dev in zip(items, devs.tolist()):
+            deviations[t.id] = dev
+    return deviations
+
+def evaluate_tower(t, ue_pos, towers, identity_counts, metrics, d_spVer=None):
+    """Run one throttled CSIV update for t and record it; returns 1 if it was in the vicinity."""
+    evaluated = 1 if t.distance_to(ue_pos) <= CSIV_VICINITY_RADIUS else 0
+    prev_state = t.state
+    prev_bars = t.recent_bar_count
+    t.update_state(ue_pos, towers, identity_counts, d_spVer)
+    t.next_state_update = now() + TOWER_UPDATE_INTERVAL
+    if t.state != prev_state:
+        metrics.transitions.inc(labels=(prev_state, t.state))
+    if t.recent_bar_count != prev_bars:
+        metrics.bar_events.inc()
+        metrics.backoff_level.observe(t.recent_bar_count)
+    return evaluated
+
+class World:
+    """All simulation state, advanced only through fixed-size step() calls."""
+    def __init__(self, ue_pos=(100.0, 100.0)):
+        self.ue = UE(ue_pos)
+        self.towers = {}
+        self.buildings = {}
+        self.propagation = PropagationModel()
+        self.spver_stats = SpVerStats()
+        self.placement = PlacementGrid(MIN_TOWER_SPACING)
+        self.seen_chunks = set()
+        self.pending_chunks = deque()
+        self.next_tower_id = 1
+        self.active_sib_msgs = []
+        self.metrics = CSIVMetrics()
+
+    def enqueue_nearby_chunks(self):
+        current_chunk = chunk_coords(self.ue.pos)
+        for dx in range(-PREFETCH_RADIUS, PREFETCH_RADIUS + 1):
+            for dy in range(-PREFETCH_RADIUS, PREFETCH_RADIUS + 1):
+                chunk = (current_chunk[0] + dx, current_chunk[1] + dy)
+                if chunk not in self.seen_chunks and chunk not in self.pending_chunks:
+                    self.pending_chunks.append(chunk)
+
+    def load_chunk(self, chunk):
+        """Generate chunk now if it hasn't been generated yet."""
+        if chunk in self.seen_chunks:
+            return False
+        self.seen_chunks.add(chunk)
+        self.next_tower_id = generate_towers_buildings(
+            chunk[0], chunk[1], self.towers, self.buildings, self.next_tower_id, self.propagation,
+            spver_stats=self.spver_stats, placement=self.placement
+        )
+        self.metrics.chunks_generated.inc()
+        self.metrics.towers_alive.set(len(self.towers))
+        return True
+
+    def generate_pending_chunks(self):
+        chunks_done = 0
+        while self.pending_chunks and chunks_done < MAX_CHUNKS_PER_FRAME and len(self.towers) < MAX_TOTAL_TOWERS:
+            if self.load_chunk(self.pending_chunks.popleft()):
+                chunks_done += 1
+        self.metrics.towers_alive.set(len(self.towers))
+
+    def toggle_rogue_nearest(self):
+        if not self.towers:
+            return
+        nearest = min(self.towers.values(), key=lambda t: t.distance_to(self.ue.pos))
+        if nearest.is_rogue:
+            nearest.is_rogue = False
+            nearest.identity = nearest.identity.replace("_ROGUE", "")
+        else:
+            nearest.is_rogue = True
+            if not nearest.identity.endswith("_ROGUE"):
+                nearest.identity += "_ROGUE"
+        assign_neighbors(self.towers)
+
+    def step(self, dt, direction=(0, 0)):
+        """Advance the simulation by exactly dt seconds with the given UE direction (-1/0/1 per axis)."""
+        tick_start = time.perf_counter()
+        metrics = self.metrics
+        sim_clock.advance(dt)
+        self.ue.move(direction, dt)
+
+        self.enqueue_nearby_chunks()
+        self.generate_pending_chunks()
+
+        # Update towers (throttled)
+        evaluations = 0
+        due = [t for t in self.towers.values() if now() >= t.next_state_update]
+        if due:
+            identity_counts = count_identities(self.towers)
+            d_spver = batch_spver_deviations(due, [self.ue.pos] * len(due))
+            for t in due:
+                evaluations += evaluate_tower(t, self.ue.pos, self.towers, identity_counts, metrics,
+                                              d_spver.get(t.id))
+        metrics.record_evaluations(evaluations, now())
+
+        # Generate SIBs only if enabled
+        if generate_sib_traffic:
+            for t in list(self.towers.values()):
+                if now() >= t.next_sib_time:
+                    sib = t.generate_sib_info()
+                    text = format_sib_summary(sib)
+                    self.active_sib_msgs.append({
+                        "tower": t,
+                        "text": text,
+                        "created": now(),
+                        "duration": 2.5
+                    })
+                    t.next_sib_time = now() + sim_rng.uniform(SIB_INTERVAL_MIN, SIB_INTERVAL_MAX)
+                    metrics.sib_emitted.inc()
+
+        current = now()
+        self.active_sib_msgs = [m for m in self.active_sib_msgs if current - m["created"] <= m["duration"]]
+        if len(self.active_sib_msgs) > MAX_ACTIVE_SIB_MSGS:
+            metrics.sib_dropped.inc(len(self.active_sib_msgs) - MAX_ACTIVE_SIB_MSGS)
+            self.active_sib_msgs = self.active_sib_msgs[-MAX_ACTIVE_SIB_MSGS:]
+
+        metrics.tick_latency.observe(time.perf_counter() - tick_start)
+
+def movement_direction(keys):
+    dx = (1 if keys[pygame.K_RIGHT] else 0) - (1 if keys[pygame.K_LEFT] else 0)
+    dy = (1 if keys[pygame.K_DOWN] else 0) - (1 if keys[pygame.K_UP] else 0)
+    return dx, dy
+
+# ---------------- Sharded city simulation ----------------
+
+# Chunks of halo around each shard: enough for neighbor lists and propagation maps.
+SHARD_HALO_CHUNKS = int(math.ceil(max(NEIGHBOR_RADIUS, PROP_RADIUS) / CHUNK_SIZE))
+# Seconds a shard waits for the others at the step barrier before giving up on the run.
+SHARD_BARRIER_TIMEOUT = 60.0
+
+@functools.lru_cache(maxsize=None)
+def identity_key(identity):
+    """Stable 64-bit key for an identity string (same in every process, unlike hash())."""
+    return int.from_bytes(hashlib.blake2b(identity.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+class TowerNoise:
+    """Gaussian draws keyed by (seed, tower id, draw number), so a tower measures the same noise
+    whichever shard simulates it. A few bytes per tower, unlike a Mersenne Twister state."""
+    __slots__ = ("key", "draws")
+
+    def __init__(self, seed, tid):
+        self.key = f"{seed}:{tid}:".encode("ascii")
+        self.draws = 0
+
+    def gauss(self, mu, sigma):
+        digest = hashlib.blake2b(self.key + str(self.draws).encode("ascii"), digest_size=16).digest()
+        self.draws += 1
+        u1 = (int.from_bytes(digest[:8], "little") + 1) / 2.0 ** 64
+        u2 = int.from_bytes(digest[8:], "little") / 2.0 ** 64
+        return mu + sigma * math.sqrt(-2.0 * math.log(u1)) * math.cos(2.0 * math.pi * u2)
+
+class UEFleet:
+    """Random-walking UEs inside a rectangle; deterministic for a given seed in every process."""
+    def __init__(self, count, bounds, seed):
+        self.bounds = bounds
+        self.rng = np.random.default_rng(seed)
+        x0, y0, x1, y1 = bounds
+        self.pos = np.column_stack([self.rng.uniform(x0, x1, count), self.rng.uniform(y0, y1, count)])
+        heading = self.rng.uniform(0, 2 * math.pi, count)
+        self.vel = np.column_stack([np.cos(heading), np.sin(heading)]) * UE_SPEED
+
+    def step(self, dt):
+        x0, y0, x1, y1 = self.bounds
+        self.pos += self.vel * dt
+        for axis, lo, hi in ((0, x0, x1), (1, y0, y1)):
+            out = (self.pos[:, axis] < lo) | (self.pos[:, axis] > hi)
+            self.vel[out, axis] *= -1
+            np.clip(self.pos[:, axis], lo, hi, out=self.pos[:, axis])
+
+    def nearest(self, points):
+        """Nearest UE position for each row of points, shape (N, 2)."""
+        d2 = ((points[:, None, :] - self.pos[None, :, :]) ** 2).sum(axis=2)
+        return self.pos[d2.argmin(axis=1)]
+
+def generate_city(width, height, seed, towers_per_chunk=None):
+    """Generate width x height chunks of towers and buildings up front; returns (towers, buildings)."""
+    sim_rng.seed(seed)
+    towers = {}
+    buildings = {}
+    chunks = [(cx, cy) for cx in range(width) for cy in range(height)]
+    generate_region(chunks, towers, buildings, 1, towers_per_chunk=towers_per_chunk)
+    return towers, buildings
+
+def partition_chunks(width, shards):
+    """Split chunk columns 0..width-1 into contiguous strips; returns shard index per column."""
+    if not 1 <= shards <= width:
+        raise ValueError(f"need 1..{width} shards for a city {width} chunks wide, got {shards}")
+    return [min(shards - 1, cx * shards // width) for cx in range(width)]
+
+class ShardSpec:
+    """Everything a worker process needs to simulate one region of the city."""
+    def __init__(self, index, owned, halo, buildings, rows, columns, seed):
+        self.index = index
+        self.owned = owned          # tower id -> Tower owned by this shard
+        self.halo = halo            # tower id -> Tower copy from neighbouring shards
+        self.buildings = buildings  # chunk -> rects for owned + halo chunks
+        self.rows = rows            # tower id -> row in the shared arrays
+        self.columns = columns      # (x0, x1) owned chunk column range
+        self.seed = seed
+
+class SharedTowerTable:
+    """Double-buffered per-tower attributes in shared memory: priority and identity key.
+
+    Step k writes and reads buffer k % 2, so a single barrier per step keeps readers and
+    writers apart.
+    """
+    def __init__(self, n_rows, names=None):
+        create = names is None
+        self.priority_shm = shared_memory.SharedMemory(
+            name=None if create else names[0], create=create, size=max(1, 2 * n_rows * 2))
+        self.identity_shm = shared_memory.SharedMemory(
+            name=None if create else names[1], create=create, size=max(1, 2 * n_rows * 8))
+        self.priority = np.ndarray((2, n_rows), dtype=np.int16, buffer=self.priority_shm.buf)
+        self.identity = np.ndarray((2, n_rows), dtype=np.int64, buffer=self.identity_shm.buf)
+
+    @property
+    def names(self):
+        return self.priority_shm.name, self.identity_shm.name
+
+    def close(self, unlink=False):
+        del self.priority, self.identity
+        for shm in (self.priority_shm, self.identity_shm):
+            shm.close()
+            if unlink:
+                shm.unlink()
+
+def _shard_worker(spec, table_names, n_rows, steps, sim_dt, fleet_args, barrier, results):
+    """Process entry point: puts (index, None, result) or (index, error text, None) on results.
+
+    A failing shard breaks the barrier so the others stop waiting for it.
+    """
+    try:
+        results.put((spec.index, None, _simulate_shard(spec, table_names, n_rows, steps, sim_dt, fleet_args, barrier)))
+    except threading.BrokenBarrierError:
+        results.put((spec.index, "aborted: another shard failed or timed out at the step barrier", None))
+    except Exception:
+        barrier.abort()
+        results.put((spec.index, traceback.format_exc(), None))
+
+def _simulate_shard(spec, table_names, n_rows, steps, sim_dt, fleet_args, barrier):
+    table = SharedTowerTable(n_rows, table_names)
+    try:
+        return _run_shard_steps(spec, table, steps, sim_dt, fleet_args, barrier)
+    finally:
+        table.close()
+
+def _run_shard_steps(spec, table, steps, sim_dt, fleet_args, barrier):
+    fleet = UEFleet(*fleet_args)
+    metrics = CSIVMetrics()
+
+    propagation = PropagationModel()
+    for chunk, rects in spec.buildings.items():
+        propagation.add_chunk(chunk, rects)
+    owned = list(spec.owned.values())
+    spver_stats = SpVerStats(capacity=max(1, len(owned)))
+    for t in owned:
+        t.propagation = propagation
+        t.spver_stats = spver_stats
+        t.spver_slot = spver_stats.allocate()
+        t.noise_rng = TowerNoise(spec.seed, t.id)
+    view = dict(spec.halo)
+    view.update(spec.owned)
+
+    owned_rows = np.array([spec.rows[t.id] for t in owned], dtype=np.intp)
+    halo = list(spec.halo.values())
+    halo_rows = np.array([spec.rows[t.id] for t in halo], dtype=np.intp)
+    owned_positions = np.array([t.pos for t in owned], dtype=np.float64).reshape(-1, 2)
+    key_to_identity = {identity_key(t.identity): t.identity for t in view.values()}
+    last_keys = None
+    identity_counts = {}
+
+    evaluations = 0
+    start = time.perf_counter()
+    for k in range(steps):
+        tick_start = time.perf_counter()
+        sim_clock.advance(sim_dt)
+        fleet.step(sim_dt)
+
+        # Publish owned towers, then read back the halo and the global identity column.
+        buf = k % 2
+        table.priority[buf, owned_rows] = [t.priority for t in owned]
+        table.identity[buf, owned_rows] = [identity_key(t.identity) for t in owned]
+        barrier.wait(SHARD_BARRIER_TIMEOUT)
+        for t, p in zip(halo, table.priority[buf, halo_rows].tolist()):
+            t.priority = p
+        keys = table.identity[buf]
+        if last_keys is None or not np.array_equal(keys, last_keys):
+            last_keys = keys.copy()
+            uniq, counts = np.unique(last_keys, return_counts=True)
+            identity_counts = {key_to_identity[key]: n
+                               for key, n in zip(uniq.tolist(), counts.tolist()) if key in key_to_identity}
+
+        current = now()
+        due = [i for i, t in enumerate(owned) if current >= t.next_state_update]
+        step_evals = 0
+        if due:
+            ue_positions = fleet.nearest(owned_positions[due]).tolist()
+            due_towers = [owned[i] for i in due]
+            d_spver = batch_spver_deviations(due_towers, ue_positions)
+            for t, ue_pos in zip(due_towers, ue_positions):
+                step_evals += evaluate_tower(t, ue_pos, view, identity_counts, metrics, d_spver.get(t.id))
+        evaluations += step_evals
+        metrics.record_evaluations(step_evals, current)
+        metrics.tick_latency.observe(time.perf_counter() - tick_start)
+    wall = time.perf_counter() - start
+
+    metrics.towers_alive.set(len(owned))
+    metrics.chunks_generated.inc(sum(1 for c in spec.buildings if spec.columns[0] <= c[0] < spec.columns[1]))
+    states = {}
+    for t in owned:
+        states[t.state] = states.get(t.state, 0) + 1
+    return evaluations, wall, states, metrics.registry
+
+def run_sharded(shards, city=(30, 30), ue_count=32, duration=30.0, seed=1, towers_per_chunk=None):
+    """Simulate a city headless across `shards` worker processes; returns the merged metrics."""
+    width, height = city
+    column_shard = partition_chunks(width, shards)
+    t0 = time.perf_counter()
+    towers, buildings = generate_city(width, height, seed, towers_per_chunk)
+    print(f"Generated {len(towers)} towers in {width}x{height} chunks ({time.perf_counter() - t0:.2f}s)")
+
+    rows = {tid: i for i, tid in enumerate(sorted(towers))}
+
+    def shard_of(t):
+        return column_shard[min(width - 1, max(0, chunk_coords(t.pos)[0]))]
+
+    specs = []
+    for s in range(shards):
+        cols = [cx for cx in range(width) if column_shard[cx] == s]
+        lo, hi = cols[0], cols[-1] + 1
+        owned = {tid: t for tid, t in towers.items() if shard_of(t) == s}
+        halo = {tid: t for tid, t in towers.items()
+                if shard_of(t) != s and lo - SHARD_HALO_CHUNKS <= chunk_coords(t.pos)[0] < hi + SHARD_HALO_CHUNKS}
+        blds = {c: r for c, r in buildings.items() if lo - SHARD_HALO_CHUNKS <= c[0] < hi + SHARD_HALO_CHUNKS}
+        specs.append(ShardSpec(s, owned, halo, blds, rows, (lo, hi), seed))
+
+    table = SharedTowerTable(len(rows))
+    sim_dt = 1.0 / SIM_HZ
+    steps = int(round(duration * SIM_HZ))
+    fleet_args = (ue_count, (0.0, 0.0, width * CHUNK_SIZE, height * CHUNK_SIZE), seed)
+    barrier = multiprocessing.Barrier(shards)
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_shard_worker,
+                                     args=(spec, table.names, len(rows), steps, sim_dt, fleet_args, barrier, results))
+             for spec in specs]
+    collected = {}
+    failures = {}
+    t0 = time.perf_counter()
+    try:
+        for p in procs:
+            p.start()
+        give_up_at = None
+        while len(collected) + len(failures) < len(procs):
+            if give_up_at is not None and time.monotonic() > give_up_at:
+                break
+            try:
+                index, error, result = results.get(timeout=0.5)
+            except queue.Empty:
+                # A worker killed outright (e.g. out of memory) never reports.
+                for index, p in enumerate(procs):
+                    if p.exitcode not in (None, 0) and index not in collected and index not in failures:
+                        failures[index] = f"worker exited with code {p.exitcode}"
+            else:
+                if error is None:
+                    collected[index] = result
+                else:
+                    failures[index] = error
+            if failures and give_up_at is None:
+                barrier.abort()
+                give_up_at = time.monotonic() + SHARD_BARRIER_TIMEOUT
+        if not failures:
+            for p in procs:
+                p.join()
+    finally:
+        for p in procs:
+            if p.is_alive():
+                p.terminate()
+            if p.pid is not None:
+                p.join()
+        table.close(unlink=True)
+    if failures:
+        # Shards that only saw the broken barrier are collateral; report the one that broke it.
+        index = min(failures, key=lambda i: (failures[i].startswith("aborted"), i))
+        raise RuntimeError(f"shard {index} failed: {failures[index]}")
+    wall = time.perf_counter() - t0
+
+    merged = CSIVMetrics()
+    total_evals = 0
+    states = {}
+    for index, (evals, shard_wall, shard_states, registry) in sorted(collected.items()):
+        merged.registry.merge(registry)
+        total_evals += evals
+        for st, n in shard_states.items():
+            states[st] = states.get(st, 0) + n
+        print(f"  shard {index}: {len(specs[index].owned)} towers, {len(specs[index].halo)} halo, "
+              f"{evals} evaluations in {shard_wall:.2f}s")
+    print(f"{shards} shard(s): {total_evals} evaluations, {duration:.0f}s simulated in {wall:.2f}s "
+          f"-> {total_evals / wall:.0f} evaluations/s; states {states}")
+    return merged
+
+# ---------------- Attack scenarios ----------------
+
+def _reselection_priority(text):
+    value = int(text)
+    if not 0 <= value <= 7:
+        raise ValueError(f"priority {value} outside 0..7")
+    return value
+
+def _positive_float(text):
+    value = float(text)
+    if not value > 0:
+        raise ValueError(f"{text} is not a positive number")
+    return value
+
+# Per attack kind: option key -> converter applied when the scenario is parsed.
+ATTACK_OPTIONS = {
+    "clone": {"priority": _reselection_priority},
+    "priority": {"level": _reselection_priority},
+    "suppress": {},
+    "power": {"gain": _positive_float},
+}
+ATTACK_KINDS = tuple(ATTACK_OPTIONS)
+# Accepted by every kind: label=<name> reports the attack under that name instead of its kind.
+ATTACK_COMMON_OPTIONS = {"label": str}
+
+class Attack:
+    """One scheduled attack: `at <time> <kind> <x> <y> [key=value ...]` in a scenario file."""
+    def __init__(self, time_s, kind, pos, options):
+        self.time = time_s
+        self.kind = kind
+        self.pos = pos
+        self.options = options
+
+    @property
+    def label(self):
+        return self.options.get("label", self.kind)
+
+class Scenario:
+    """A parsed scenario file.
+
+    Directives, one per line (# starts a comment):
+        seed <int>                 base seed; run i uses seed + i
+        duration <seconds>         simulated time per run
+        ue <x> <y>                 UE start position
+        path <x> <y>               waypoint; the UE drives through waypoints in order at UE_SPEED
+        at <t> clone <x> <y> [priority=<nearest's>]   rogue tower at (x, y) spoofing the identity of the
+                                   nearest clean tower
+        at <t> priority <x> <y> [level=7]   nearest tower escalates cellReselectionPriority
+        at <t> suppress <x> <y>    nearest tower stops advertising neighbors
+        at <t> power <x> <y> [gain=8]       nearest tower's transmit power is multiplied by gain
+    Any attack also takes label=<name> to be reported under that name rather than its kind.
+    """
+    def __init__(self):
+        self.seed = 1
+        self.duration = 30.0
+        self.ue_start = (100.0, 100.0)
+        self.path = []
+        self.attacks = []
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.parse(f.read(), path)
+
+    @classmethod
+    def parse(cls, text, source="<scenario>"):
+        scenario = cls()
+        for lineno, raw in enumerate(text.splitlines(), 1):
+            words = raw.split("#", 1)[0].split()
+            if not words:
+                continue
+            try:
+                directive = words[0]
+                if directive == "seed":
+                    scenario.seed = int(words[1])
+                elif directive == "duration":
+                    scenario.duration = float(words[1])
+                elif directive == "ue":
+                    scenario.ue_start = (float(words[1]), float(words[2]))
+                elif directive == "path":
+                    scenario.path.append((float(words[1]), float(words[2])))
+                elif directive == "at":
+                    kind = words[2]
+                    if kind not in ATTACK_KINDS:
+                        raise ValueError(f"unknown attack '{kind}' (expected one of {', '.join(ATTACK_KINDS)})")
+                    time_s, x, y = float(words[1]), float(words[3]), float(words[4])
+                    options = {}
+                    for word in words[5:]:
+                        key, sep, value = word.partition("=")
+                        if not sep:
+                            raise ValueError(f"expected key=value, got '{word}'")
+                        allowed = dict(ATTACK_COMMON_OPTIONS, **ATTACK_OPTIONS[kind])
+                        if key not in allowed:
+                            raise ValueError(f"unknown option '{key}' for {kind} (allowed: {', '.join(allowed)})")
+                        options[key] = allowed[key](value)
+                    scenario.attacks.append(Attack(time_s, kind, (x, y), options))
+                else:
+                    raise ValueError(f"unknown directive '{directive}'")
+            except (IndexError, ValueError) as e:
+                raise ValueError(f"{source}:{lineno}: {e}: {raw.strip()}") from None
+        scenario.attacks.sort(key=lambda a: a.time)
+        return scenario
+
+def apply_attack(world, attack):
+    """Launch attack in world; returns the attacked Tower or None if there was nothing to target."""
+    world.load_chunk(chunk_coords(attack.pos))
+    candidates = [t for t in world.towers.values() if not (attack.kind == "clone" and t.is_rogue)]
+    if not candidates:
+        return None
+    nearest = min(candidates, key=lambda t: t.distance_to(attack.pos))
+    if attack.kind == "clone":
+        # Exact spoofed identity (no _ROGUE label) so dVer sees the duplicate.
+        target = Tower(world.next_tower_id, attack.pos, priority=attack.options.get("priority", nearest.priority),
+                       identity=nearest.identity, propagation=world.propagation,
+                       spver_stats=world.spver_stats)
+        target.is_rogue = True
+        world.towers[target.id] = target
+        world.next_tower_id += 1
+        world.placement.add(target.pos)
+        world.propagation.build_shadow_map(target)
+        assign_neighbors(world.towers)
+    elif attack.kind == "priority":
+        target = nearest
+        target.priority = attack.options.get("level", 7)
+    elif attack.kind == "suppress":
+        target = nearest
+        target.suppress_neighbors = True
+        target.neighbors = []
+    else:
+        target = nearest
+        target.tx_gain *= attack.options.get("gain", 8.0)
+    return target
+
+def run_scenario_once(scenario, seed):
+    """Run one seeded pass; returns [(label, time_to_suspect, time_to_barred)] with None when not reached."""
+    sim_clock.t = 0.0
+    sim_rng.seed(seed)
+    world = World(scenario.ue_start)
+    sim_dt = 1.0 / SIM_HZ
+    pending = list(scenario.attacks)
+    waypoints = deque(scenario.path)
+    active = []  # [attack, target, start, t_suspect, t_barred]
+    for _ in range(int(round(scenario.duration * SIM_HZ))):
+        direction = (0.0, 0.0)
+        while waypoints:
+            dx = waypoints[0][0] - world.ue.pos[0]
+            dy = waypoints[0][1] - world.ue.pos[1]
+            dist = math.hypot(dx, dy)
+            if dist < 1e-6:
+                waypoints.popleft()
+                continue
+            scale = min(1.0, dist / (UE_SPEED * sim_dt)) / dist
+            direction = (dx * scale, dy * scale)
+            break
+        world.step(sim_dt, direction)
+        current = now()
+        while pending and pending[0].time <= current:
+            attack = pending.pop(0)
+            active.append([attack, apply_attack(world, attack), current, None, None])
+        for entry in active:
+            target = entry[1]
+            # Only states entered after the attack started count as detections.
+            if target is None or target.last_state_change_time < entry[2]:
+                continue
+            if entry[3] is None and target.state in ("SUSPECT", "BARRED"):
+                entry[3] = current - entry[2]
+            if entry[4] is None and target.state == "BARRED":
+                entry[4] = current - entry[2]
+    return [(attack.label, t_suspect, t_barred) for attack, _, _, t_suspect, t_barred in active]
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+def run_scenarios(scenario, runs):
+    """Run the scenario `runs` times with seeds seed..seed+runs-1 and summarize detection latency per attack label."""
+    samples = {}
+    for i in range(runs):
+        for kind, t_suspect, t_barred in run_scenario_once(scenario, scenario.seed + i):
+            entry = samples.setdefault(kind, {"attacks": 0, "suspect": [], "barred": []})
+            entry["attacks"] += 1
+            if t_suspect is not None:
+                entry["suspect"].append(t_suspect)
+            if t_barred is not None:
+                entry["barred"].append(t_barred)
+    report = {}
+    for kind, entry in samples.items():
+        report[kind] = {"attacks": entry["attacks"]}
+        for stage in ("suspect", "barred"):
+            values = sorted(entry[stage])
+            report[kind][stage] = {
+                "detected": len(values),
+                "min": values[0] if values else None,
+                "p50": _percentile(values, 0.5) if values else None,
+                "p90": _percentile(values, 0.9) if values else None,
+                "max": values[-1] if values else None,
+                "mean": statistics.mean(values) if values else None,
+            }
+    return report
+
+def format_latency_report(report):
+    def fmt(v):
+        return "   -  " if v is None else f"{v:6.2f}"
+    lines = [f"{'attack':<14}{'stage':<9}{'detected':>10}{'min':>8}{'p50':>8}{'p90':>8}{'max':>8}{'mean':>8}"]
+    for kind in sorted(report):
+        entry = report[kind]
+        for stage, label in (("suspect", "SUSPECT"), ("barred", "BARRED")):
+            st = entry[stage]
+            lines.append(f"{kind:<14}{label:<9}{st['detected']:>5}/{entry['attacks']:<4}"
+                         f"  {fmt(st['min'])}  {fmt(st['p50'])}  {fmt(st['p90'])}  {fmt(st['max'])}  {fmt(st['mean'])}")
+    return "\n".join(lines)
+
+# ---------------- Rendering ----------------
+
+def render_frame(screen, world, fonts, alpha, show_menu, show_help, show_log, show_sib, log_entries):
+    """Draw one frame; alpha in [0, 1) blends the UE between the last two sim states. Read-only on world."""
+    towers = world.towers
+    ue_pos = world.ue.lerp_pos(alpha)
+
+    # Camera
+    screen_size = screen.get_size()
+    width, height = screen_size
+    camera_offset = (ue_pos[0] - width / 2, ue_pos[1] - height / 2)
+
+    # Draw background/grid
+    draw_city_block_background(screen, camera_offset, screen_size)
+
+    # Draw roads & buildings & towers
+    draw_roads(screen, camera_offset, screen_size)
+    draw_buildings(screen, world.buildings, camera_offset)
+
+    font_small = fonts["small"]
+    for t in towers.values():
+        st, sc = t.get_status()
+        color = t.get_display_color(now())
+        screen_pos = (int(t.pos[0] - camera_offset[0]), int(t.pos[1] - camera_offset[1]))
+        pygame.draw.circle(screen, color, screen_pos, 16)
+        id_surf = font_small.render(f"{t.identity}", True, (220, 220, 220))
+        screen.blit(id_surf, (screen_pos[0] - 25, screen_pos[1] - 35))
+        pr_surf = font_small.render(f"P:{t.priority}", True, (255, 255, 0))
+        screen.blit(pr_surf, (screen_pos[0] - 25, screen_pos[1] + 20))
+        s_surf = font_small.render(f"{st}", True, (0, 0, 0))
+        screen.blit(s_surf, (screen_pos[0] - 25, screen_pos[1] - 8))
+
+    # Draw UE
+    ue_screen = (int(ue_pos[0] - camera_offset[0]), int(ue_pos[1] - camera_offset[1]))
+    pygame.draw.rect(screen, COLOR_CAR, pygame.Rect(ue_screen[0] - 10, ue_screen[1] - 10, 20, 20))
+    ue_surf = fonts["status"].render("UE", True, (0, 0, 0))
+    screen.blit(ue_surf, (ue_screen[0] - 10, ue_screen[1] - 30))
+
+    # Nearest tower HUD
+    if towers:
+        distances = [(t.distance_to(ue_pos), t) for t in towers.values()]
+        distances.sort(key=lambda x: x[0])
+        nearest = distances[0][1]
+        st, sc = nearest.get_status()
+        panel_w = 360
+        panel_h = 160
+        panel = pygame.Surface((panel_w, panel_h), pygame.SRCALPHA)
+        panel.fill((15, 15, 25, 230))
+        screen.blit(panel, (10, 10))
+        lines = [
+            f"Nearest Tower ID: {nearest.id}",
+            f"Identity: {nearest.identity}",
+            f"Priority: {nearest.priority}",
+            f"State: {st}",
+            f"Suspicion Score: {sc:.2f}",
+            f"SIB Summary: {format_sib_summary(nearest.generate_sib_info(rng=random))}",
+        ]
+        for i, line in enumerate(lines):
+            txt = fonts["status"].render(line, True, (240, 240, 240))
+            screen.blit(txt, (15, 15 + i * 18))
+
+    # Active SIB overlays (nearby only)
+    if show_sib:
+        current = now()
+        for msg in world.active_sib_msgs:
+            age = current - msg["created"]
+            tower = msg["tower"]
+            if tower.distance_to(ue_pos) > SIB_DRAW_DISTANCE:
+                continue
+            screen_pos = (int(tower.pos[0] - camera_offset[0]), int(tower.pos[1] - camera_offset[1]))
+            x = screen_pos[0]
+            y = screen_pos[1] - 55
+            alpha_px = 255
+            if age > msg["duration"] * 0.7:
+                fade_factor = (msg["duration"] - age) / (msg["duration"] * 0.3)
+                alpha_px = int(255 * max(0.1, fade_factor))
+            sib_bg = pygame.Surface((260, 28), pygame.SRCALPHA)
+            sib_bg.fill((30, 30, 40, alpha_px))
+            screen.blit(sib_bg, (x - 130, y))
+            txt = font_small.render(msg["text"], True, (200, 200, 200))
+            screen.blit(txt, (x - 125, y + 4))
+
+    # Footer
+    footer = [
+        "M:menu H:help Y:SIB L:log C:clear R:rogue T:toggle-SIB-gen F:fullscreen ESC:exit",
+        f"W_DVER={W_DVER:.2f} W_PVER={W_PVER:.2f} W_SPVER={W_SPVER:.2f} THETA_SUSPECT={THETA_SUSPECT:.2f} THETA_BARRED={THETA_BARRED:.2f}"
+    ]
+    for i, text in enumerate(footer):
+        foot_bg = pygame.Surface((width - 20, 22), pygame.SRCALPHA)
+        foot_bg.fill((10, 10, 10, 180))
+        screen.blit(foot_bg, (10, height - (i + 1) * 24 - 2))
+        txt = fonts["status"].render(text, True, (200, 200, 200))
+        screen.blit(txt, (15, height - (i + 1) * 24 + 2))
+
+    # Overlays
+    if show_log:
+        draw_log_panel(screen, log_entries, fonts["log"], screen_size)
+    if show_menu:
+        draw_menu(screen, fonts["menu"], screen_size)
+    if show_help:
+        draw_help_overlay(screen, fonts["help"], screen_size)
+
 # ---------------- Main Loop ----------------
 
-def run_game():
+def load_fonts():
+    return {
+        "status": pygame.font.SysFont(FONT_NAME, 16),
+        "log": pygame.font.SysFont(FONT_NAME, 14),
+        "menu": pygame.font.SysFont(FONT_NAME, 18),
+        "help": pygame.font.SysFont(FONT_NAME, 20),
+        "small": pygame.font.SysFont(FONT_NAME, 14),
+    }
+
+def apply_sim_key(world, key):
+    """Apply a key that changes simulation state or parameters; returns False for UI-only keys."""
     global W_DVER, W_PVER, W_SPVER, THETA_SUSPECT, THETA_BARRED, COMBO_PRIORITY_LOCATION_BOOST, generate_sib_traffic
+    if key == pygame.K_r:
+        world.toggle_rogue_nearest()
+    elif key == pygame.K_1:
+        W_DVER += 0.1
+    elif key == pygame.K_2:
+        W_DVER = max(0.0, W_DVER - 0.1)
+    elif key == pygame.K_3:
+        W_PVER += 0.1
+    elif key == pygame.K_4:
+        W_PVER = max(0.0, W_PVER - 0.1)
+    elif key == pygame.K_5:
+        W_SPVER += 0.1
+    elif key == pygame.K_6:
+        W_SPVER = max(0.0, W_SPVER - 0.1)
+    elif key == pygame.K_7:
+        THETA_SUSPECT = min(1.0, THETA_SUSPECT + 0.05)
+    elif key == pygame.K_8:
+        THETA_SUSPECT = max(0.0, THETA_SUSPECT - 0.05)
+    elif key == pygame.K_9:
+        THETA_BARRED = min(1.0, THETA_BARRED + 0.05)
+    elif key == pygame.K_0:
+        THETA_BARRED = max(0.0, THETA_BARRED - 0.05)
+    elif key == pygame.K_q:
+        COMBO_PRIORITY_LOCATION_BOOST += 0.1
+    elif key == pygame.K_a:
+        COMBO_PRIORITY_LOCATION_BOOST = max(0.0, COMBO_PRIORITY_LOCATION_BOOST - 0.1)
+    elif key == pygame.K_t:
+        generate_sib_traffic = not generate_sib_traffic
+        if DEBUG_MODE:
+            print(f"SIB traffic generation {'enabled' if generate_sib_traffic else 'disabled'}")
+    else:
+        return False
+    return True
+
+def run_game(record_path=None, seed=None):
     pygame.init()
     try:
         screen = pygame.display.set_mode((1000, 700))
@@ -544,23 +2027,19 @@ def run_game():
         sys.exit(1)
     pygame.display.set_caption("CSIV Demo v7.2 - Clean/Rogue Neighbor Isolation")
     clock = pygame.time.Clock()
-    font_status = pygame.font.SysFont(FONT_NAME, 16)
-    font_log = pygame.font.SysFont(FONT_NAME, 14)
-    font_menu = pygame.font.SysFont(FONT_NAME, 18)
-    font_help = pygame.font.SysFont(FONT_NAME, 20)
-    font_small = pygame.font.SysFont(FONT_NAME, 14)
-    ue = UE((100.0, 100.0))
-    towers = {}
-    buildings = {}
-    seen_chunks = set()
-    pending_chunks = deque()
-    next_tower_id = 1
+    fonts = load_fonts()
+    seed = seed if seed is not None else random.randrange(2 ** 31)
+    sim_rng.seed(seed)
+    world = World((100.0, 100.0))
+    recorder = SessionRecorder(record_path, seed, world) if record_path else None
+    exporter = MetricsExporter(world.metrics.registry, METRICS_FILE, METRICS_INTERVAL, METRICS_HTTP_PORT)
+    sim_dt = 1.0 / SIM_HZ
+    accumulator = 0.0
     show_menu = True
     show_help = False
     show_log = False
     show_sib = True
     log_entries = []
-    active_sib_msgs = []
     fullscreen = False
 
     last_escape_time = 0.0
@@ -571,265 +2050,259 @@ def run_game():
 
     running = True
     exit_reason = None
-    while running:
-        if DEBUG_MODE:
-            print("tick")
-        dt = clock.tick(60) / 1000.0
-        current = now()
-
-        for event in pygame.event.get():
+    try:
+        while running:
             if DEBUG_MODE:
-                print("EVENT:", event)
-            if event.type == pygame.QUIT:
-                exit_reason = "QUIT"
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    if current < 0.5:
-                        if DEBUG_MODE:
-                            print("Ignored early ESC event")
-                    else:
-                        now_time = now()
-                        if now_time - last_escape_time < ESC_GRACE:
-                            exit_reason = "ESC"
-                            running = False
-                        else:
-                            last_escape_time = now_time
-                            show_menu = not show_menu
+                print("tick")
+            frame_dt = clock.tick(RENDER_FPS) / 1000.0
+            current = now()
+            frame_keys = []
+
+            for event in pygame.event.get():
+                if DEBUG_MODE:
+                    print("EVENT:", event)
+                if event.type == pygame.QUIT:
+                    exit_reason = "QUIT"
+                    running = False
+                elif event.type == pygame.KEYDOWN:
+                    frame_keys.append(event.key)
+                    if apply_sim_key(world, event.key):
+                        pass
+                    elif event.key == pygame.K_ESCAPE:
+                        if current < 0.5:
                             if DEBUG_MODE:
-                                print("ESC pressed once; press again quickly to exit.")
-                elif event.key in (pygame.K_F11, pygame.K_f):
-                    fullscreen = not fullscreen
-                    if fullscreen:
-                        screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-                    else:
-                        screen = pygame.display.set_mode((1000, 700))
-                elif event.key == pygame.K_m:
-                    show_menu = not show_menu
-                elif event.key == pygame.K_h:
-                    show_help = not show_help
-                elif event.key == pygame.K_l:
-                    snapshot = format_tower_snapshot(towers)
-                    timestamp = time.strftime("%H:%M:%S")
-                    log_entries.append(f"---- {timestamp} ----")
-                    log_entries.extend(snapshot)
-                    show_log = not show_log
-                elif event.key == pygame.K_c:
-                    log_entries.clear()
-                elif event.key == pygame.K_r:
-                    if towers:
-                        nearest = min(towers.values(), key=lambda t: t.distance_to(ue.pos))
-                        if nearest.is_rogue:
-                            nearest.is_rogue = False
-                            nearest.identity = nearest.identity.replace("_ROGUE", "")
+                                print("Ignored early ESC event")
                         else:
-                            nearest.is_rogue = True
-                            if not nearest.identity.endswith("_ROGUE"):
-                                nearest.identity += "_ROGUE"
-                        # recompute neighbors with segregation rules
-                        all_towers = list(towers.values())
-                        for t in all_towers:
-                            if t.is_rogue:
-                                t.neighbors = []
+                            now_time = time.time()
+                            if now_time - last_escape_time < ESC_GRACE:
+                                exit_reason = "ESC"
+                                running = False
                             else:
-                                candidates = [other for other in all_towers if other is not t and not other.is_rogue]
-                                dists = sorted([(t.distance_to(other.pos), other.id) for other in candidates])
-                                t.neighbors = [tid for dist, tid in dists if dist <= NEIGHBOR_RADIUS][:MAX_NEIGHBORS]
-                elif event.key == pygame.K_1:
-                    W_DVER += 0.1
-                elif event.key == pygame.K_2:
-                    W_DVER = max(0.0, W_DVER - 0.1)
-                elif event.key == pygame.K_3:
-                    W_PVER += 0.1
-                elif event.key == pygame.K_4:
-                    W_PVER = max(0.0, W_PVER - 0.1)
-                elif event.key == pygame.K_5:
-                    W_SPVER += 0.1
-                elif event.key == pygame.K_6:
-                    W_SPVER = max(0.0, W_SPVER - 0.1)
-                elif event.key == pygame.K_7:
-                    THETA_SUSPECT = min(1.0, THETA_SUSPECT + 0.05)
-                elif event.key == pygame.K_8:
-                    THETA_SUSPECT = max(0.0, THETA_SUSPECT - 0.05)
-                elif event.key == pygame.K_9:
-                    THETA_BARRED = min(1.0, THETA_BARRED + 0.05)
-                elif event.key == pygame.K_0:
-                    THETA_BARRED = max(0.0, THETA_BARRED - 0.05)
-                elif event.key == pygame.K_q:
-                    COMBO_PRIORITY_LOCATION_BOOST += 0.1
-                elif event.key == pygame.K_a:
-                    COMBO_PRIORITY_LOCATION_BOOST = max(0.0, COMBO_PRIORITY_LOCATION_BOOST - 0.1)
-                elif event.key == pygame.K_y:
-                    show_sib = not show_sib
-                elif event.key == pygame.K_t:
-                    generate_sib_traffic = not generate_sib_traffic
-                    if DEBUG_MODE:
-                        print(f"SIB traffic generation {'enabled' if generate_sib_traffic else 'disabled'}")
-
-        # Movement
-        keys = pygame.key.get_pressed()
-        speed = 180 * dt
-        if keys[pygame.K_LEFT]:
-            ue.pos[0] -= speed
-        if keys[pygame.K_RIGHT]:
-            ue.pos[0] += speed
-        if keys[pygame.K_UP]:
-            ue.pos[1] -= speed
-        if keys[pygame.K_DOWN]:
-            ue.pos[1] += speed
-
-        # Enqueue nearby chunks
-        current_chunk = chunk_coords(ue.pos)
-        for dx in range(-PREFETCH_RADIUS, PREFETCH_RADIUS + 1):
-            for dy in range(-PREFETCH_RADIUS, PREFETCH_RADIUS + 1):
-                chunk = (current_chunk[0] + dx, current_chunk[1] + dy)
-                if chunk not in seen_chunks and chunk not in pending_chunks:
-                    pending_chunks.append(chunk)
-
-        # Throttled chunk creation
-        chunks_done = 0
-        while pending_chunks and chunks_done < MAX_CHUNKS_PER_FRAME and len(towers) < MAX_TOTAL_TOWERS:
-            chunk = pending_chunks.popleft()
-            if chunk in seen_chunks:
-                continue
-            seen_chunks.add(chunk)
-            next_tower_id = generate_towers_buildings(
-                chunk[0], chunk[1], towers, buildings, next_tower_id
-            )
-            chunks_done += 1
-
-        # Update towers (throttled)
-        for t in towers.values():
-            if now() >= t.next_state_update:
-                t.update_state(ue.pos, towers)
-                t.next_state_update = now() + TOWER_UPDATE_INTERVAL
-
-        # Generate SIBs only if enabled
-        if generate_sib_traffic:
-            for t in list(towers.values()):
-                if now() >= t.next_sib_time:
-                    sib = t.generate_sib_info()
-                    text = format_sib_summary(sib)
-                    active_sib_msgs.append({
-                        "tower": t,
-                        "text": text,
-                        "created": now(),
-                        "duration": 2.5
-                    })
-                    t.next_sib_time = now() + random.uniform(SIB_INTERVAL_MIN, SIB_INTERVAL_MAX)
-
-        if len(active_sib_msgs) > MAX_ACTIVE_SIB_MSGS:
-            active_sib_msgs = active_sib_msgs[-MAX_ACTIVE_SIB_MSGS:]
-
-        # Camera
-        screen_size = screen.get_size()
-        width, height = screen_size
-        camera_offset = (ue.pos[0] - width / 2, ue.pos[1] - height / 2)
-
-        # Draw background/grid
-        draw_city_block_background(screen, camera_offset, screen_size)
-
-        # Draw roads & buildings & towers
-        draw_roads(screen, camera_offset, screen_size)
-        draw_buildings(screen, buildings, camera_offset)
-
-        for t in towers.values():
-            st, sc = t.get_status()
-            color = t.get_display_color(now())
-            screen_pos = (int(t.pos[0] - camera_offset[0]), int(t.pos[1] - camera_offset[1]))
-            pygame.draw.circle(screen, color, screen_pos, 16)
-            id_surf = font_small.render(f"{t.identity}", True, (220, 220, 220))
-            screen.blit(id_surf, (screen_pos[0] - 25, screen_pos[1] - 35))
-            pr_surf = font_small.render(f"P:{t.priority}", True, (255, 255, 0))
-            screen.blit(pr_surf, (screen_pos[0] - 25, screen_pos[1] + 20))
-            s_surf = font_small.render(f"{st}", True, (0, 0, 0))
-            screen.blit(s_surf, (screen_pos[0] - 25, screen_pos[1] - 8))
-
-        # Draw UE
-        ue_screen = (int(ue.pos[0] - camera_offset[0]), int(ue.pos[1] - camera_offset[1]))
-        pygame.draw.rect(screen, COLOR_CAR, pygame.Rect(ue_screen[0] - 10, ue_screen[1] - 10, 20, 20))
-        ue_surf = pygame.font.SysFont(FONT_NAME, 16).render("UE", True, (0, 0, 0))
-        screen.blit(ue_surf, (ue_screen[0] - 10, ue_screen[1] - 30))
-
-        # Nearest tower HUD
-        if towers:
-            distances = [(t.distance_to(ue.pos), t) for t in towers.values()]
-            distances.sort(key=lambda x: x[0])
-            nearest = distances[0][1]
-            st, sc = nearest.get_status()
-            panel_w = 360
-            panel_h = 160
-            panel = pygame.Surface((panel_w, panel_h), pygame.SRCALPHA)
-            panel.fill((15, 15, 25, 230))
-            screen.blit(panel, (10, 10))
-            lines = [
-                f"Nearest Tower ID: {nearest.id}",
-                f"Identity: {nearest.identity}",
-                f"Priority: {nearest.priority}",
-                f"State: {st}",
-                f"Suspicion Score: {sc:.2f}",
-                f"SIB Summary: {format_sib_summary(nearest.generate_sib_info())}",
-            ]
-            for i, line in enumerate(lines):
-                txt = font_status.render(line, True, (240, 240, 240))
-                screen.blit(txt, (15, 15 + i * 18))
-
-        # Active SIB overlays (nearby only)
-        if show_sib:
-            new_sib_msgs = []
-            for msg in active_sib_msgs:
-                age = now() - msg["created"]
-                if age > msg["duration"]:
-                    continue
-                tower = msg["tower"]
-                if tower.distance_to(ue.pos) > SIB_DRAW_DISTANCE:
-                    continue
-                new_sib_msgs.append(msg)
-                screen_pos = (int(tower.pos[0] - camera_offset[0]), int(tower.pos[1] - camera_offset[1]))
-                x = screen_pos[0]
-                y = screen_pos[1] - 55
-                alpha = 255
-                if age > msg["duration"] * 0.7:
-                    fade_factor = (msg["duration"] - age) / (msg["duration"] * 0.3)
-                    alpha = int(255 * max(0.1, fade_factor))
-                sib_bg = pygame.Surface((260, 28), pygame.SRCALPHA)
-                sib_bg.fill((30, 30, 40, alpha))
-                screen.blit(sib_bg, (x - 130, y))
-                txt = pygame.font.SysFont(FONT_NAME, 14).render(msg["text"], True, (200, 200, 200))
-                screen.blit(txt, (x - 125, y + 4))
-            active_sib_msgs = new_sib_msgs
-
-        # Footer
-        footer = [
-            "M:menu H:help Y:SIB L:log C:clear R:rogue T:toggle-SIB-gen F:fullscreen ESC:exit",
-            f"W_DVER={W_DVER:.2f} W_PVER={W_PVER:.2f} W_SPVER={W_SPVER:.2f} THETA_SUSPECT={THETA_SUSPECT:.2f} THETA_BARRED={THETA_BARRED:.2f}"
-        ]
-        for i, text in enumerate(footer):
-            foot_bg = pygame.Surface((width - 20, 22), pygame.SRCALPHA)
-            foot_bg.fill((10, 10, 10, 180))
-            screen.blit(foot_bg, (10, height - (i + 1) * 24 - 2))
-            txt = font_status.render(text, True, (200, 200, 200))
-            screen.blit(txt, (15, height - (i + 1) * 24 + 2))
-
-        # Overlays
-        if show_log:
-            draw_log_panel(screen, log_entries, font_log, screen_size)
-        if show_menu:
-            draw_menu(screen, font_menu, screen_size)
-        if show_help:
-            draw_help_overlay(screen, font_help, screen_size)
-
-        pygame.display.flip()
-
+                                last_escape_time = now_time
+                                show_menu = not show_menu
+                                if DEBUG_MODE:
+                                    print("ESC pressed once; press again quickly to exit.")
+                    elif event.key in (pygame.K_F11, pygame.K_f):
+                        fullscreen = not fullscreen
+                        if fullscreen:
+                            screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+                        else:
+                            screen = pygame.display.set_mode((1000, 700))
+                    elif event.key == pygame.K_m:
+                        show_menu = not show_menu
+                    elif event.key == pygame.K_h:
+                        show_help = not show_help
+                    elif event.key == pygame.K_l:
+                        snapshot = format_tower_snapshot(world.towers)
+                        timestamp = time.strftime("%H:%M:%S")
+                        log_entries.append(f"---- {timestamp} ----")
+                        log_entries.extend(snapshot)
+                        show_log = not show_log
+                    elif event.key == pygame.K_c:
+                        log_entries.clear()
+                    elif event.key == pygame.K_y:
+                        show_sib = not show_sib
+
+            # Fixed-step simulation: catch up with as many steps as wall time demands (capped),
+            # so slow frames never stretch a single step.
+            direction = movement_direction(pygame.key.get_pressed())
+            accumulator += frame_dt
+            steps = 0
+            while accumulator >= sim_dt and steps < MAX_SIM_STEPS_PER_FRAME:
+                world.step(sim_dt, direction)
+                accumulator -= sim_dt
+                steps += 1
+            if accumulator >= sim_dt:
+                # Too far behind: drop the backlog instead of spiralling; results stay step-exact.
+                accumulator %= sim_dt
+            if recorder is not None:
+                recorder.frame(steps, direction, frame_keys, world)
+
+            render_frame(screen, world, fonts, accumulator / sim_dt,
+                         show_menu, show_help, show_log, show_sib, log_entries)
+            pygame.display.flip()
+            exporter.poll()
+    finally:
+        # Close the recording even on a crash, so it keeps its gzip end marker and stays replayable.
+        exporter.close()
+        if recorder is not None:
+            recorder.close()
     if DEBUG_MODE:
         print(f"Exiting run_game reason: {exit_reason}")
     pygame.quit()
 
+# ---------------- Record / Replay ----------------
+
+RECORDING_MAGIC = b"CSIVREC2"
+_FRAME = struct.Struct("<BbbBddQ")  # steps, dx, dy, key count, UE x, UE y, world digest
+_KEY = struct.Struct("<I")
+
+def world_digest(world):
+    """64-bit fingerprint of everything a replay must reproduce: each tower's state and score
+    (to 6 decimals) and the position of sim_rng's stream."""
+    h = hashlib.blake2b(digest_size=8)
+    for t in world.towers.values():
+        h.update(f"{t.id}:{t.state}:{t.S:.6f};".encode("ascii"))
+    h.update(np.array(sim_rng.getstate()[1], dtype=np.uint32).tobytes())
+    return int.from_bytes(h.digest(), "little")
+
+class SessionRecorder:
+    """Writes a gzip'd recording: magic, JSON header (seed, SIM_HZ, tunables, UE start), then one record per frame
+    with the inputs applied and the resulting UE position and world_digest()."""
+    def __init__(self, path, seed, world):
+        self.file = gzip.open(path, "wb")
+        header = {
+            "seed": seed,
+            "sim_hz": SIM_HZ,
+            "params": {name: globals()[name] for name in TUNABLE_PARAMS},
+            "ue_start": list(world.ue.pos),
+        }
+        blob = json.dumps(header).encode("utf-8")
+        self.file.write(RECORDING_MAGIC + _KEY.pack(len(blob)) + blob)
+
+    def frame(self, steps, direction, keys, world):
+        keys = keys[:255]
+        self.file.write(_FRAME.pack(steps, direction[0], direction[1], len(keys),
+                                    world.ue.pos[0], world.ue.pos[1], world_digest(world)))
+        for key in keys:
+            self.file.write(_KEY.pack(key))
+
+    def close(self):
+        self.file.close()
+
+def load_recording(path):
+    """Returns (header, frames) where frames are (steps, direction, keys, ue_pos, digest) tuples.
+
+    A recording cut short (the session was killed before the file was closed) yields its complete frames.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        # A decompressor object, unlike gzip.open, hands back whatever precedes a missing end marker.
+        data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(raw)
+    except zlib.error:
+        data = b""
+    if not data.startswith(RECORDING_MAGIC):
+        if data.startswith(RECORDING_MAGIC[:-1]):
+            raise ValueError(f"{path}: recording from an older version of the demo; record it again")
+        raise ValueError(f"{path}: not a CSIV session recording")
+    offset = len(RECORDING_MAGIC)
+    (length,) = _KEY.unpack_from(data, offset)
+    offset += _KEY.size
+    header = json.loads(data[offset:offset + length].decode("utf-8"))
+    offset += length
+    frames = []
+    while offset + _FRAME.size <= len(data):
+        steps, dx, dy, n_keys, x, y, digest = _FRAME.unpack_from(data, offset)
+        if offset + _FRAME.size + n_keys * _KEY.size > len(data):
+            break
+        offset += _FRAME.size
+        keys = [_KEY.unpack_from(data, offset + i * _KEY.size)[0] for i in range(n_keys)]
+        offset += n_keys * _KEY.size
+        frames.append((steps, (dx, dy), keys, (x, y), digest))
+    return header, frames
+
+def replay_session(path, render=True):
+    """Re-run a recording frame-for-frame; returns the number of frames whose UE position or world digest diverged."""
+    header, frames = load_recording(path)
+    if header["sim_hz"] != SIM_HZ:
+        raise ValueError(f"{path}: recorded at SIM_HZ={header['sim_hz']}, this build runs {SIM_HZ}")
+    globals().update(header["params"])
+    sim_clock.t = 0.0
+    sim_rng.seed(header["seed"])
+    world = World(tuple(header["ue_start"]))
+    sim_dt = 1.0 / SIM_HZ
+
+    if render:
+        pygame.init()
+        screen = pygame.display.set_mode((1000, 700))
+        pygame.display.set_caption(f"CSIV Demo v7.2 - replay {path}")
+        clock = pygame.time.Clock()
+        fonts = load_fonts()
+
+    diverged = 0
+    first_diverged = None
+    total_steps = 0
+    start = time.perf_counter()
+    for index, (steps, direction, keys, ue_pos, digest) in enumerate(frames):
+        for key in keys:
+            apply_sim_key(world, key)
+        for _ in range(steps):
+            world.step(sim_dt, direction)
+        total_steps += steps
+        if (abs(world.ue.pos[0] - ue_pos[0]) > 1e-6 or abs(world.ue.pos[1] - ue_pos[1]) > 1e-6
+                or world_digest(world) != digest):
+            diverged += 1
+            if first_diverged is None:
+                first_diverged = index
+        if render:
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                break
+            clock.tick(RENDER_FPS)
+            render_frame(screen, world, fonts, 1.0, False, False, False, True, [])
+            pygame.display.flip()
+    wall = time.perf_counter() - start
+    if render:
+        pygame.quit()
+
+    print(f"Replayed {len(frames)} frames / {total_steps} sim steps ({now():.1f}s simulated) in {wall:.2f}s; "
+          f"{diverged} frame(s) diverged from the recorded UE position or tower states"
+          + (f" (first at frame {first_diverged})" if first_diverged is not None else ""))
+    return diverged
+
 # ---------------- Entry Point ----------------
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CSIV interactive demo sandbox")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="run a headless city simulation across N worker processes")
+    parser.add_argument("--city", type=int, nargs=2, default=(30, 30), metavar=("W", "H"),
+                        help="city size in chunks for --shards (default 30 30)")
+    parser.add_argument("--towers-per-chunk", type=int, nargs=2, metavar=("MIN", "MAX"),
+                        help=f"tower density for --shards; needs 0 <= MIN <= MAX (default {TOWERS_PER_CHUNK_MIN} {TOWERS_PER_CHUNK_MAX})")
+    parser.add_argument("--ues", type=int, default=32, help="random-walking UEs for --shards (default 32)")
+    parser.add_argument("--duration", type=float, default=30.0, help="simulated seconds for --shards (default 30)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="world seed (default: 1 for --shards, random for interactive sessions)")
+    parser.add_argument("--scenario", metavar="FILE", help="run an attack scenario file headless and report detection latency")
+    parser.add_argument("--runs", type=int, default=20, help="seeded runs per --scenario (default 20)")
+    parser.add_argument("--report", metavar="FILE", help="also write the --scenario latency report as JSON")
+    parser.add_argument("--record", metavar="FILE", help="record the interactive session for deterministic replay")
+    parser.add_argument("--replay", metavar="FILE", help="re-run a recorded session frame-for-frame")
+    parser.add_argument("--headless", action="store_true", help="with --replay, run without a window")
+    args = parser.parse_args(argv)
+    if args.shards and not 1 <= args.shards <= args.city[0]:
+        parser.error(f"--shards must be between 1 and the city width ({args.city[0]} chunks)")
+    if args.shards and args.ues < 1:
+        parser.error("--ues must be at least 1")
+    if args.towers_per_chunk:
+        lo, hi = args.towers_per_chunk
+        if not 0 <= lo <= hi:
+            parser.error("--towers-per-chunk needs 0 <= MIN <= MAX")
+        if not args.shards:
+            parser.error("--towers-per-chunk only applies with --shards")
+    return args
+
 if __name__ == "__main__":
+    args = parse_args()
+    if args.shards:
+        merged = run_sharded(args.shards, tuple(args.city), args.ues, args.duration,
+                             1 if args.seed is None else args.seed,
+                             tuple(args.towers_per_chunk) if args.towers_per_chunk else None)
+        if METRICS_FILE:
+            merged.registry.write_file(METRICS_FILE)
+        sys.exit(0)
+    if args.scenario:
+        report = run_scenarios(Scenario.load(args.scenario), args.runs)
+        print(format_latency_report(report))
+        if args.report:
+            with open(args.report, "w") as f:
+                json.dump(report, f, indent=2)
+        sys.exit(0)
+    if args.replay:
+        sys.exit(1 if replay_session(args.replay, render=not args.headless) else 0)
     try:
-        run_game()
+        run_game(record_path=args.record, seed=args.seed)
     except Exception:
         import traceback, datetime
         tb = traceback.format_exc()